@@ -614,10 +614,14 @@ def cmd_enhancements(args):
     #   - "multi-write" sequences (multiple registry values/types written together).
     if args.list_fx:
         # List FX available to this device as defined in vendor_toggles.ini.
+        # One registry snapshot per endpoint subkey shared by the listing's signature
+        # checks and all FX state reads below.
+        values_cache = {}
         fx_list = _list_fx_for_device(
             target["id"], target["flow"],
             ini_path=getattr(args, "vendor_ini", None),
             device_name=target["name"],
+            values_cache=values_cache,
         )
         fx_list = sorted(fx_list, key=lambda x: (x.get("fx_name") or "").lower())
         # JSON form is consumed by the GUI; includes per-FX state if readable.
@@ -630,7 +634,7 @@ def cmd_enhancements(args):
                 entry = fx.get("entry")
                 state = None
                 try:
-                    state = _read_vendor_entry_state(entry, target["id"], target["flow"])
+                    state = _read_vendor_entry_state(entry, target["id"], target["flow"], values_cache=values_cache)
                 except Exception:
                     state = None
                 result["availableFX"].append({
@@ -648,7 +652,7 @@ def cmd_enhancements(args):
         for fx in fx_list:
             entry = fx.get("entry")
             try:
-                st = _read_vendor_entry_state(entry, target["id"], target["flow"])
+                st = _read_vendor_entry_state(entry, target["id"], target["flow"], values_cache=values_cache)
             except Exception:
                 st = None
             state_txt = "Enabled" if st is True else "Disabled" if st is False else "Unknown"
@@ -30,6 +30,7 @@
 
 import re
 import time
+import functools
 import warnings
 import ctypes
 import winreg
@@ -51,7 +52,6 @@ from .logging_setup import _log, _log_exc, _dbg
 
 # Removed: from .vendor_db import ...
 import comtypes.automation as automation
-import copy
 import threading
 import comtypes
 _com_tls = threading.local()
@@ -236,6 +236,11 @@ def _reemit_non_error_stderr(buf_text: str):
     except Exception:
         pass
 
+# Trailing ".{endpoint-guid}" of an MMDevice id
+_ENDPOINT_GUID_RE = re.compile(r'\.\{([0-9A-Fa-f-]+)\}$')
+# Device ids are stable per endpoint and listing/polling code asks for the same few
+# over and over; memoize the regex extraction (bounded).
+@functools.lru_cache(maxsize=1024)
 def _extract_endpoint_guid_from_device_id(device_id: str):
     """
     Extract the endpoint GUID (with braces) from a device id like:
@@ -243,8 +248,7 @@ def _extract_endpoint_guid_from_device_id(device_id: str):
     Returns "{83a9be54-901e-4429-993b-c9088e3028a0}" or None.
     """
     try:
-        # Use raw string literal for regex pattern to avoid SyntaxWarning
-        m = re.search(r'\.\{([0-9A-Fa-f-]+)\}$', device_id)
+        m = _ENDPOINT_GUID_RE.search(device_id)
         if not m:
             return None
         return "{" + m.group(1) + "}"
@@ -1079,14 +1083,21 @@ def _dump_mmdevices_all_values(device_id):
           - 'FxProperties'
           - 'FxProperties\\{plugin-guid}\\User'
         """
-        # Enumerate values in current key
+        # One open per key: QueryInfoKey sizes both enumerations, so neither loop
+        # needs a trailing failing Enum* call, and subkey names are collected
+        # before recursing so the handle is closed first.
         try:
             key = winreg.OpenKey(hive, root_path, 0, winreg.KEY_READ)
         except OSError:
             return
+        subnames = []
         try:
+            try:
+                n_subkeys, n_values, _ = winreg.QueryInfoKey(key)
+            except OSError:
+                n_subkeys = n_values = None
             i = 0
-            while True:
+            while n_values is None or i < n_values:
                 try:
                     name, val, typ = winreg.EnumValue(key, i)
                     i += 1
@@ -1125,32 +1136,23 @@ def _dump_mmdevices_all_values(device_id):
                 except Exception:
                     rec["dataRaw"] = None
                 items.append(rec)
-        finally:
-            try:
-                winreg.CloseKey(key)
-            except Exception:
-                pass
-        # Recurse into subkeys
-        try:
-            key = winreg.OpenKey(hive, root_path, 0, winreg.KEY_READ)
-        except OSError:
-            return
-        try:
             i = 0
-            while True:
+            while n_subkeys is None or i < n_subkeys:
                 try:
-                    subname = winreg.EnumKey(key, i)
+                    subnames.append(winreg.EnumKey(key, i))
                     i += 1
                 except OSError:
                     break
-                next_rel = rel_subkey + "\\" + subname if rel_subkey else subname
-                next_path = root_path + "\\" + subname
-                _enum_key_recursive(hive, hive_name, next_path, next_rel, flow)
         finally:
             try:
                 winreg.CloseKey(key)
             except Exception:
                 pass
+        # Recurse into subkeys
+        for subname in subnames:
+            next_rel = rel_subkey + "\\" + subname if rel_subkey else subname
+            next_path = root_path + "\\" + subname
+            _enum_key_recursive(hive, hive_name, next_path, next_rel, flow)
     for hive, hive_name in roots:
         for flow in ("Render", "Capture"):
             # Start recursion from the two well-known roots
@@ -1201,6 +1203,12 @@ def _diff_mmdevices_lists(before_list, after_list):
             if str(a.get("name", "")).lower().startswith(guid_disable):
                 hits.append(a)
             continue
+        if a == b:
+            # Identical record (the common case between two dumps): nothing changed and
+            # no flip is possible, so only the Disable_SysFx hit check applies.
+            if str(a.get("name", "")).lower().startswith(guid_disable):
+                hits.append(b)
+            continue
             
         try:
             tA = a.get("type")
@@ -1209,7 +1217,8 @@ def _diff_mmdevices_lists(before_list, after_list):
             vB = _normalize_preview(b.get("dataPreview"))
             
             if (tA != tB) or (vA != vB):
-                row = copy.deepcopy(a)
+                # Dump records are flat (str/int/None values): a shallow copy is a full copy
+                row = dict(a)
                 row["typeAfter"] = tB
                 row["dataPreviewAfter"] = vB
                 changed.append(row)
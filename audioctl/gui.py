@@ -462,6 +462,9 @@ class AudioGUI:
         # "Enable vs Disable Listen", Enhancements state, and FX list without
         # a blocking subprocess call on every right click.
         self.device_state_cache = {}
+        # Generation of the background state population; bumped on every refresh so
+        # results from a superseded pass are dropped.
+        self._state_gen = 0
         # NEW: flag to suppress auto-refresh while in our own modal workflows
         # (learn flows involve interactive prompts; refreshing during them is noisy and risky).
         self._in_modal_operation = False
@@ -1429,43 +1432,43 @@ class AudioGUI:
 
     def _schedule_state_population(self):
         """
-        Start or restart incremental population of device_state_cache.
-        Why incremental:
-        - get-device-state can do COM reads and registry probes; running it for every
-          device synchronously would freeze the UI.
-        - Tk's event loop stays responsive when we schedule one device per tick.
+        Start or restart background population of device_state_cache.
+        Why a background thread:
+        - get-device-state can do COM reads and registry probes; even one device per
+          Tk tick blocked the event loop for the duration of each CLI call.
+        - A single worker walks the device list and hands each result back to the Tk
+          thread via root.after, so menus read the cache without waiting on I/O.
         Note: We clear the cache on each refresh so we never mix old state from devices
-        that may have disappeared or changed.
+        that may have disappeared or changed; a newer refresh also retires the old worker.
         """
-        # Reset cache and queue
+        # Reset cache and start a new generation
         self.device_state_cache.clear()
+        self._state_gen += 1
+        gen = self._state_gen
         # Simple queue of (id, flow)
-        self._state_queue = [(d["id"], d["flow"]) for d in self.devices]
-        # Kick off first step
-        self.root.after(10, self._populate_next_device_state)
+        queue = [(d["id"], d["flow"]) for d in self.devices]
 
-    def _populate_next_device_state(self):
-        """
-        Process one device from the queue:
-        - call get-device-state and cache it
-        - reschedule until queue is empty
-        """
-        q = getattr(self, "_state_queue", None)
-        if not q:
-            self._state_queue = []
-            return
-        dev_id, flow = q.pop(0)
-        try:
-            st = run_audioctl(
-                ["get-device-state", "--id", dev_id, "--flow", flow],
-                capture_json=True,
-                expect_ok=False,
-            )
-        except Exception:
-            st = None
-        if isinstance(st, dict):
+        def worker():
+            for dev_id, flow in queue:
+                if gen != self._state_gen:
+                    return  # superseded by a newer refresh
+                try:
+                    st = run_audioctl(
+                        ["get-device-state", "--id", dev_id, "--flow", flow],
+                        capture_json=True,
+                        expect_ok=False,
+                    )
+                except Exception:
+                    st = None
+                if isinstance(st, dict):
+                    self.root.after(0, self._store_device_state, gen, dev_id, st)
+
+        threading.Thread(target=worker, daemon=True).start()
+
+    def _store_device_state(self, gen, dev_id, st):
+        # Runs on the Tk thread; ignore results from a superseded population pass.
+        if gen == self._state_gen:
             self.device_state_cache[dev_id] = st
-        self.root.after(10, self._populate_next_device_state)
 
     def adjust_layout_to_content(self):
         self.root.update_idletasks()
@@ -17,9 +17,9 @@ Design goals (why this module looks "overbuilt"):
 import os
 import sys
 import traceback
-import datetime
 import tempfile
 import threading
+import time
 
 try:
     import faulthandler
@@ -39,7 +39,18 @@ _LOG_DIR = None
 _LOG_PATH = None
 _INITIALIZED = False
 _FH = None            # faulthandler file handle (kept open for process lifetime)
+_LOG_FD = None        # raw append-mode fd used by _log/_dbg (kept open for process lifetime)
+_LOG_LOCK = threading.Lock()
+
+# Precompiled line templates (bytes, fed straight to os.write).
+# The timestamp is formatted at most once per second and reused as bytes, so a
+# log call is one %-format + one encode of the message.
+_LOG_FMT = b"[%b] %b\n"
+_DBG_FMT = b"[%b] [DBG pid=%d tid=%d] %b\n"
+_TS_SEC = None
+_TS_BYTES = b""
 _HOOKS_INSTALLED = False
+_ATEXIT_REGISTERED = False
 
 
 def set_debug(on: bool = True):
@@ -146,6 +157,11 @@ def _global_excepthook(exc_type, exc_value, exc_tb):
         pass
 
 
+# Tag our hooks so any copy of this module (reload, embedded interpreter, test
+# harness re-import) can tell the installed hook is already ours.
+_global_excepthook._audioctl = True
+
+
 def _unraisable_hook(unraisable):
     """
     Python 3.8+ hook for exceptions raised in __del__ and other "unraisable" places.
@@ -162,13 +178,18 @@ def _unraisable_hook(unraisable):
         pass
 
 
+_unraisable_hook._audioctl = True
+
+
 def _install_hooks_once():
     """
     Install exception/console hooks (idempotent). No file I/O here.
 
     Why:
     - Hooks should be installed only once even if modules are imported multiple
-      times (e.g., in embedded Python or some test harnesses).
+      times (e.g., in embedded Python or some test harnesses). _HOOKS_INSTALLED is
+      per module copy, so each sys hook is also skipped when the installed one
+      carries our `_audioctl` tag.
     - Installation is deferred until first log write so we don't modify global
       interpreter behavior during import unless logging is actually used.
     """
@@ -178,13 +199,15 @@ def _install_hooks_once():
 
     # Uncaught exceptions -> log file.
     try:
-        sys.excepthook = _global_excepthook
+        if not getattr(sys.excepthook, "_audioctl", False):
+            sys.excepthook = _global_excepthook
     except Exception:
         pass
 
     # Unraisable exceptions -> log file (Python 3.8+).
     try:
-        sys.unraisablehook = _unraisable_hook
+        if not getattr(getattr(sys, "unraisablehook", None), "_audioctl", False):
+            sys.unraisablehook = _unraisable_hook
     except Exception:
         pass
 
@@ -217,25 +240,59 @@ def _install_hooks_once():
     _HOOKS_INSTALLED = True
 
 
-# sys.exit wrapper (installed lazily)
-# Why:
-# - Many program exits are "normal" but still useful when correlating logs
-#   (e.g., sys.exit() from GUI close or fatal argument parsing).
-_orig_sys_exit = sys.exit
+def _open_log_fd():
+    """
+    Open the raw append-mode fd used by _log/_dbg. Returns None on failure.
+
+    Why a raw fd:
+    - os.write() skips io.TextIOWrapper (encoder, buffering and its locks), and we
+      no longer re-open the file for every line.
+    - O_APPEND makes every write land at the current end of file, so the in-place
+      '#CONFIG' rewrite (write_log_config) and the faulthandler handle can share
+      the file safely.
+    - No O_BINARY on purpose: on Windows the CRT text mode keeps translating "\n"
+      to "\r\n", matching the lines written through text-mode handles.
+    """
+    try:
+        flags = os.O_WRONLY | os.O_APPEND | os.O_CREAT | getattr(os, "O_NOINHERIT", 0)
+        return os.open(_LOG_PATH, flags, 0o666)
+    except Exception:
+        return None
+
 
+def _ts_bytes():
+    """Current local timestamp as b'YYYY-mm-dd HH:MM:SS' (cached per second)."""
+    global _TS_SEC, _TS_BYTES
+    sec = int(time.time())
+    if sec != _TS_SEC:
+        _TS_BYTES = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(sec)).encode("ascii")
+        _TS_SEC = sec
+    return _TS_BYTES
 
-def _logged_sys_exit(code=0):
-    # Breadcrumb before raising SystemExit (which is how sys.exit works internally).
+
+def _write_log_bytes(data: bytes):
+    """
+    Append one already-formatted, UTF-8 encoded line (best-effort, never raises).
+
+    The lock serializes writers: os.write is atomic for small appends on POSIX,
+    but the Windows CRT emulates O_APPEND with a seek + write pair.
+    """
     try:
-        _log(f"sys.exit invoked with code={code!r}")
+        fd = _LOG_FD
+        if fd is not None:
+            with _LOG_LOCK:
+                os.write(fd, data)
+            return
+        # Fallback when the fd could not be opened (or was closed at exit).
+        with open(_LOG_PATH, "a", encoding="utf-8", errors="replace") as f:
+            f.write(data.decode("utf-8", "replace"))
     except Exception:
         pass
-    raise SystemExit(code)
 
 
 def _atexit_close_handles():
     """
-    Best-effort cleanup for faulthandler file handle.
+    Best-effort cleanup for the faulthandler file handle and the raw log fd.
 
     Why:
     - Ensure log output is flushed even on normal interpreter shutdown.
@@ -249,12 +306,48 @@ def _atexit_close_handles():
             _FH = None
     except Exception:
         pass
+    try:
+        global _LOG_FD
+        fd, _LOG_FD = _LOG_FD, None   # later writes fall back to open/append
+        if fd is not None:
+            with _LOG_LOCK:
+                os.close(fd)
+    except Exception:
+        pass
 
 
 def _atexit_normal():
     # Breadcrumb that the interpreter reached atexit (useful when debugging crashes
     # where this line never appears).
     _log("atexit: process exiting normally")
+    # Exit-code breadcrumb.
+    # Why not wrap sys.exit:
+    # - Replacing sys.exit adds a Python-level call + log write to every exit and
+    #   breaks code that introspects sys.exit (debuggers, third-party libraries).
+    # - Instead we inspect whatever SystemExit the interpreter left behind. This is
+    #   best-effort: last_value/last_exc are only populated when the exception went
+    #   through the top-level handler.
+    try:
+        exc = getattr(sys, "last_exc", None) or getattr(sys, "last_value", None)
+        if isinstance(exc, SystemExit):
+            _log(f"SystemExit code={exc.code!r}")
+    except Exception:
+        pass
+
+
+def _atexit_all():
+    """
+    Single atexit handler: final breadcrumb first, then close handles.
+
+    Why one handler instead of two:
+    - One atexit slot and one Python-level dispatch at shutdown.
+    - Ordering is explicit here instead of relying on atexit's LIFO order.
+    """
+    try:
+        _atexit_normal()
+    except Exception:
+        pass
+    _atexit_close_handles()
 
 
 def _ensure_init():
@@ -264,7 +357,6 @@ def _ensure_init():
     - Write the first breadcrumb
     - Install exception hooks and console handler
     - Enable faulthandler (if available)
-    - Wrap sys.exit
     - Register atexit handlers
 
     Why this is lazy:
@@ -274,7 +366,7 @@ def _ensure_init():
     - Minimize side effects during module import (import order matters when COM
       modules and PyInstaller shims are involved).
     """
-    global _INITIALIZED, _FH
+    global _INITIALIZED, _FH, _ATEXIT_REGISTERED, _LOG_FD
     if _INITIALIZED:
         return
 
@@ -282,10 +374,10 @@ def _ensure_init():
 
     # Create file and first breadcrumb (this is the first actual write).
     # If this fails (permissions, AV, corporate lockdown), we still keep running.
+    if _LOG_FD is None:
+        _LOG_FD = _open_log_fd()
     try:
-        ts = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        with open(_LOG_PATH, "a", encoding="utf-8", errors="replace") as f:
-            f.write(f"[{ts}] logging to: {_LOG_PATH}\n")
+        _write_log_bytes(_LOG_FMT % (_ts_bytes(), f"logging to: {_LOG_PATH}".encode("utf-8", "replace")))
     except Exception:
         pass
 
@@ -310,20 +402,15 @@ def _ensure_init():
             except Exception:
                 pass
 
-    # Wrap sys.exit once so exits become visible in logs.
-    try:
-        if sys.exit is not _logged_sys_exit:
-            sys.exit = _logged_sys_exit
-    except Exception:
-        pass
-
-    # atexit handlers give us "last breadcrumb wins" behavior on normal exit.
-    try:
-        import atexit
-        atexit.register(_atexit_normal)
-        atexit.register(_atexit_close_handles)
-    except Exception:
-        pass
+    # atexit handler gives us "last breadcrumb wins" behavior on normal exit.
+    # Guarded separately from _INITIALIZED so a retried init never registers twice.
+    if not _ATEXIT_REGISTERED:
+        try:
+            import atexit
+            atexit.register(_atexit_all)
+            _ATEXIT_REGISTERED = True
+        except Exception:
+            pass
 
     _INITIALIZED = True
 
@@ -345,9 +432,7 @@ def _log(msg: str):
     """
     _ensure_init()       # creates file on first use
     try:
-        ts = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        with open(_LOG_PATH, "a", encoding="utf-8", errors="replace") as f:
-            f.write(f"[{ts}] {msg}\n")
+        _write_log_bytes(_LOG_FMT % (_ts_bytes(), str(msg).encode("utf-8", "replace")))
     except Exception:
         pass
 
@@ -383,11 +468,9 @@ def _dbg(msg: str):
         return
     try:
         _ensure_init()   # creates file on first debug write
-        ts = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
         tid = threading.get_ident()
         pid = os.getpid()
-        with open(_LOG_PATH, "a", encoding="utf-8", errors="replace") as f:
-            f.write(f"[{ts}] [DBG pid={pid} tid={tid}] {msg}\n")
+        _write_log_bytes(_DBG_FMT % (_ts_bytes(), pid, tid, str(msg).encode("utf-8", "replace")))
     except Exception:
         pass
 
@@ -493,11 +576,12 @@ def write_log_config(updates: dict) -> None:
     Merge `updates` into the persisted config and rewrite the single '#CONFIG'
     line at the very top of the log file, preserving all existing log history.
 
-    Implementation note (Windows): the logging layer may hold an OPEN append
-    handle on this file (faulthandler). On Windows you cannot os.replace() a file
-    that has an open handle, so we must NOT swap the file out. Instead we rewrite
-    the SAME file in place (open 'r+', rewrite from offset 0, truncate). Writing
-    through the existing path does not conflict with a separate append handle.
+    Implementation note (Windows): the logging layer may hold OPEN append
+    handles on this file (faulthandler, raw _log fd). On Windows you cannot
+    os.replace() a file that has an open handle, so we must NOT swap the file
+    out. Instead we rewrite the SAME file in place (open 'r+', rewrite from
+    offset 0, truncate). Writing through the existing path does not conflict with
+    a separate append handle.
 
     Best-effort: on any failure this silently does nothing. It never raises and
     never disturbs normal log appending.
@@ -9,7 +9,7 @@
 #       * multi_write toggles (multiple registry values/types written together)
 #
 # It also owns:
-#   - INI parsing + caching keyed by (absolute path, mtime)
+#   - INI parsing + caching keyed by (absolute path, mtime_ns, size)
 #   - learn flows that derive toggle rules from registry snapshots
 #   - fast (no COM) read helpers used by GUI polling
 #
@@ -20,12 +20,15 @@
 # specific driver/device, and persists that decision into vendor_toggles.ini.
 import os
 import re
-import configparser
+import sys
 import time
 import winreg
 import hashlib
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from types import MappingProxyType
 from .compat import is_admin
-from .logging_setup import _exe_dir
+from .logging_setup import _exe_dir, _dbg
 from .devices import (
     _extract_endpoint_guid_from_device_id,
     _set_enhancements_registry,
@@ -44,23 +47,32 @@ from .devices import (
 #     - DWORD: integer
 #     - SZ:    string
 #     - BINARY: "hex:aa,bb,cc" (readable, diffable, and lossless)
+_TYPE_TO_NAME = {
+    winreg.REG_DWORD:  "REG_DWORD",
+    winreg.REG_SZ:     "REG_SZ",
+    winreg.REG_BINARY: "REG_BINARY",
+}
+_NAME_TO_TYPE = {v: k for k, v in _TYPE_TO_NAME.items()}
 def _reg_type_to_name(typ: int) -> str:
-    if typ == winreg.REG_DWORD: return "REG_DWORD"
-    if typ == winreg.REG_SZ:    return "REG_SZ"
-    if typ == winreg.REG_BINARY:return "REG_BINARY"
-    return f"REG_{typ}"
+    return _TYPE_TO_NAME.get(typ) or f"REG_{typ}"
 def _reg_name_to_type(name: str) -> int:
-    nm = (name or "").strip().upper()
-    if nm == "REG_DWORD":  return winreg.REG_DWORD
-    if nm == "REG_SZ":     return winreg.REG_SZ
-    if nm == "REG_BINARY": return winreg.REG_BINARY
-    # Fallback; unsupported types will be ignored gracefully
-    raise ValueError(f"Unsupported registry type: {name}")
-def _format_bin_hex(data_hex_no_prefix: str) -> str:
+    try:
+        return _NAME_TO_TYPE[(name or "").strip().upper()]
+    except KeyError:
+        # Fallback; unsupported types will be ignored gracefully
+        raise ValueError(f"Unsupported registry type: {name}") from None
+def _format_bin_hex(data_hex_no_prefix) -> str:
     # REG_BINARY values are stored in INI in "hex:aa,bb,cc" form (human-readable but exact).
-    """Return 'hex:' form for INI readability from raw hex (no prefix)."""
+    """Return 'hex:' form for INI readability from raw bytes or raw hex (no prefix)."""
+    if isinstance(data_hex_no_prefix, (bytes, bytearray, memoryview)):
+        return "hex:" + bytes(data_hex_no_prefix).hex(",")
     h = data_hex_no_prefix or ""
-    return "hex:" + ",".join(h[i:i+2] for i in range(0, len(h), 2))
+    try:
+        # Snapshot dataRaw is lowercase hex; bytes.hex(sep) does the pairing in C.
+        return "hex:" + bytes.fromhex(h).hex(",")
+    except ValueError:
+        # Not clean hex (odd length/stray chars): keep the verbatim pairing.
+        return "hex:" + ",".join(h[i:i+2] for i in range(0, len(h), 2))
 def _parse_bin_hex(text: str) -> bytes:
     """
     Accepts:
@@ -71,10 +83,34 @@ def _parse_bin_hex(text: str) -> bytes:
     t = (text or "").strip().lower()
     if t.startswith("hex:"):
         t = t[4:]
-    t = t.replace(",", "").replace(" ", "")
+    t = t.translate(_HEX_STRIP_TABLE)
     if t == "":
         return b""
     return bytes.fromhex(t)
+_HEX_STRIP_TABLE = str.maketrans("", "", ", ")
+def _decode_reg_payload(typ: int, text):
+    """
+    INI payload text -> SetValueEx-ready data for a registry type id.
+    Returns None for unsupported types; raises on malformed payloads.
+    """
+    if typ == winreg.REG_DWORD: return int(text)
+    if typ == winreg.REG_SZ:    return str(text)
+    if typ == winreg.REG_BINARY:return _parse_bin_hex(text)
+    return None
+def _decode_write_payload(type_name: str, text):
+    """Parse-time variant of _decode_reg_payload: None when the payload cannot be decoded."""
+    try:
+        return _decode_reg_payload(_reg_name_to_type(type_name), text)
+    except Exception:
+        return None
+def _write_payload(w: dict, enable: bool):
+    """
+    Expected payload of a multi-write toggle for comparisons: the value decoded at
+    INI load time ('enable_data'/'disable_data') when present, else the INI text.
+    """
+    if enable:
+        return w.get("enable_data", w.get("enable"))
+    return w.get("disable_data", w.get("disable"))
 # --- Device-name -> GUID bucket mapping (for INI readability; case-insensitive) ---
 def _canon_device_name(name: str) -> str:
     """Canonicalize a friendly name for bucketing (case-insensitive)."""
@@ -92,7 +128,9 @@ def _name_bucket_id(name: str) -> str:
     canon = _canon_device_name(name)
     h = hashlib.sha1(canon.encode("utf-8", "replace")).hexdigest()[:8]
     return h
-def _append_guid_to_name_bucket(ini_path: str, section_name: str, device_name: str, guid_lc: str):
+# name_<id> = ... / guids_<id> = ... lines (kind, bucket id, value)
+_NAME_BUCKET_LINE_RE = re.compile(r"^\s*(name|guids)_([0-9a-f]+)\s*=\s*(.*)$", re.IGNORECASE)
+def _append_guid_to_name_bucket(ini_path: str, section_name: str, device_name: str, guid_lc: str, editor=None):
     """
     Maintain per-section device name buckets:
       name_<id>  = <device_name>
@@ -100,31 +138,20 @@ def _append_guid_to_name_bucket(ini_path: str, section_name: str, device_name: s
     - bucket id derived from canonicalized device_name (case-insensitive)
     - one bucket can contain multiple GUIDs (same name reused across endpoints)
     - does not remove anything; only adds/updates in-place
+    editor: an open _IniEditor to batch into (else the file is edited on its own).
     """
     if not ini_path or not section_name or not device_name or not guid_lc:
         return
+    if editor is None:
+        with _IniEditor(ini_path) as ed:
+            return _append_guid_to_name_bucket(ini_path, section_name, device_name, guid_lc, editor=ed)
     bid = _name_bucket_id(device_name)
     key_name = f"name_{bid}"
     key_guids = f"guids_{bid}"
     sec_hdr = f"[{section_name}]"
-    try:
-        with open(ini_path, "r", encoding="utf-8", errors="replace") as f:
-            lines = f.read().splitlines(keepends=True)
-    except FileNotFoundError:
-        lines = []
-    # Locate section
-    sec_start = None
-    sec_end = len(lines)
-    for i, line in enumerate(lines):
-        s = line.strip()
-        if s.startswith("[") and s.endswith("]"):
-            if sec_start is None:
-                if s.lower() == sec_hdr.lower():
-                    sec_start = i
-            else:
-                sec_end = i
-                break
-    if sec_start is None:
+    lines = editor.lines
+    bounds = editor.section_bounds(section_name)
+    if bounds is None:
         # Section missing: create minimal section (best-effort)
         new = []
         if lines and not lines[-1].endswith(("\n", "\r")):
@@ -133,27 +160,26 @@ def _append_guid_to_name_bucket(ini_path: str, section_name: str, device_name: s
         new.append(f"{key_name} = {device_name}\n")
         new.append(f"{key_guids} = {guid_lc}\n")
         lines.extend(new)
-        with open(ini_path, "w", encoding="utf-8", errors="replace") as f:
-            f.writelines(lines)
+        editor.dirty = True
         return
+    sec_start, sec_end = bounds
     # Find existing name_<id> and guids_<id>
     name_idx = None
     guids_idx = None
     existing_guids = None
-    re_name = re.compile(rf"^\s*{re.escape(key_name)}\s*=\s*(.*)$", re.IGNORECASE)
-    re_guids = re.compile(rf"^\s*{re.escape(key_guids)}\s*=\s*(.*)$", re.IGNORECASE)
-    for i in range(sec_start + 1, sec_end):
-        m = re_name.match(lines[i])
-        if m:
-            name_idx = i
-            # keep first-seen display name; do not overwrite (human readability)
-            break
     for i in range(sec_start + 1, sec_end):
-        m = re_guids.match(lines[i])
-        if m:
+        m = _NAME_BUCKET_LINE_RE.match(lines[i])
+        if not m or m.group(2).lower() != bid:
+            continue
+        if m.group(1).lower() == "name":
+            if name_idx is None:
+                # keep first-seen display name; do not overwrite (human readability)
+                name_idx = i
+        elif guids_idx is None:
             guids_idx = i
-            txt = (m.group(1) or "").strip()
+            txt = (m.group(3) or "").strip()
             existing_guids = [x.strip().lower() for x in txt.split(",") if x.strip()]
+        if name_idx is not None and guids_idx is not None:
             break
     # Ensure name_<id> exists
     if name_idx is None:
@@ -165,6 +191,7 @@ def _append_guid_to_name_bucket(ini_path: str, section_name: str, device_name: s
         sec_end += 1
         if insert_at <= sec_end:
             sec_end += 0
+        editor.dirty = True
     # Ensure guids_<id> contains guid
     if existing_guids is None:
         # create guids line
@@ -173,6 +200,7 @@ def _append_guid_to_name_bucket(ini_path: str, section_name: str, device_name: s
             lines.insert(insert_at, "\n")
             insert_at += 1
         lines.insert(insert_at, f"{key_guids} = {guid_lc}\n")
+        editor.dirty = True
     else:
         if guid_lc.lower() not in {g.lower() for g in existing_guids}:
             existing_guids.append(guid_lc.lower())
@@ -186,9 +214,27 @@ def _append_guid_to_name_bucket(ini_path: str, section_name: str, device_name: s
                     lines.insert(insert_at, "\n")
                     insert_at += 1
                 lines.insert(insert_at, new_line)
-    with open(ini_path, "w", encoding="utf-8", errors="replace") as f:
-        f.writelines(lines)
+            editor.dirty = True
+def _add_guid_to_section_and_name_bucket(ini_path, section_name, device_name, guid_lc, editor=None):
+    """
+    Record guid_lc on [section_name]: its devices line, then (best-effort) the
+    name_<id>/guids_<id> bucket for device_name, in one INI rewrite.
+    Errors from the devices append propagate; name-bucket errors are ignored.
+    """
+    if editor is None:
+        with _IniEditor(ini_path) as ed:
+            return _add_guid_to_section_and_name_bucket(ini_path, section_name, device_name, guid_lc, editor=ed)
+    _append_guid_to_section(ini_path, section_name, guid_lc, editor=editor)
+    try: _append_guid_to_name_bucket(ini_path, section_name, device_name, guid_lc, editor=editor)
+    except Exception: pass
 # --- Heuristic FX matching helpers (pattern + registry signature) ---
+@functools.lru_cache(maxsize=1024)
+def _device_name_pattern_re(pat):
+    """Compiled case-insensitive device_name_pattern, or None if it isn't a valid regex."""
+    try:
+        return re.compile(pat, re.IGNORECASE)
+    except Exception:
+        return None
 def _fx_pattern_match(entry: dict, device_name: str) -> bool:
     """
     Regex match against entry['device_name_pattern'] (case-insensitive).
@@ -197,8 +243,9 @@ def _fx_pattern_match(entry: dict, device_name: str) -> bool:
     pat = (entry.get("device_name_pattern") or "").strip()
     if not pat or not device_name:
         return False
+    rx = _device_name_pattern_re(pat)
     try:
-        return re.search(pat, device_name, re.IGNORECASE) is not None
+        return rx is not None and rx.search(device_name) is not None
     except Exception:
         return False
 def _fx_signature_matches_legacy(entry: dict, device_id: str, flow: str) -> bool:
@@ -263,11 +310,12 @@ def _fx_signature_matches_legacy(entry: dict, device_id: str, flow: str) -> bool
             return True
     return False
 
-def _legacy_value_matches_this_guid_now(entry: dict, device_id: str, flow: str) -> bool:
+def _legacy_value_matches_this_guid_now(entry: dict, device_id: str, flow: str, values_cache=None) -> bool:
     """
     Legacy (single DWORD) FX applicability truth check:
     True if the value exists for THIS GUID right now and equals either enable or disable.
     This does not rely on GUID lists or device names.
+    values_cache: optional per-batch dict, see _read_endpoint_value.
     """
     try:
         val_name = (entry.get("value_name") or "").strip().lower()
@@ -283,8 +331,8 @@ def _legacy_value_matches_this_guid_now(entry: dict, device_id: str, flow: str)
             base = _endpoint_base_path(device_id, flow, subk)
             if not base:
                 continue
-            cu_val, cu_typ = _fast_read_one("HKCU", base, val_name)
-            lm_val, lm_typ = _fast_read_one("HKLM", base, val_name)
+            cu_val, cu_typ = _read_signature_value(device_id, flow, subk, base, "HKCU", val_name, values_cache)
+            lm_val, lm_typ = _read_signature_value(device_id, flow, subk, base, "HKLM", val_name, values_cache)
             if cu_typ == winreg.REG_DWORD:
                 try:
                     v = int(cu_val)
@@ -323,11 +371,12 @@ def _legacy_find_live_subkey(entry: dict, device_id: str, flow: str):
         return None
     except Exception:
         return None
-def _fx_signature_matches_multi(entry, device_id, flow) -> bool:
+def _fx_signature_matches_multi(entry, device_id, flow, values_cache=None) -> bool:
     """
     Multi-write FX spoof verification (Profile-Aware + Universal Fallback):
     Evaluates signature matching per device 'profile', but safely falls back 
     to the old universal method if no strict profile matches.
+    values_cache: optional per-batch dict, see _read_endpoint_value.
     """
     writes_all = entry.get("writes") or []
     if not writes_all:
@@ -338,52 +387,55 @@ def _fx_signature_matches_multi(entry, device_id, flow) -> bool:
         qt = 0.60
     qt = max(0.50, min(0.95, qt))
 
-    # Build profiles based on write{i}_devices
-    profiles = {}
-    for w in writes_all:
-        devs = w.get("devices")
-        if devs is not None and len(devs) > 0:
-            for g in devs:
-                if g not in profiles: profiles[g] = []
-                profiles[g].append(w)
-    uni_writes = [w for w in writes_all if w.get("devices") is None]
-    for g in profiles:
-        profiles[g].extend(uni_writes)
+    # Profiles based on write{i}_devices (precomputed at load for INI entries)
+    profiles = _entry_write_profiles(entry)
+    # Several writes (and every profile pass below re-reads them): snapshot each
+    # (hive, subkey) once for this check instead of an open + query per write per pass.
+    if values_cache is None and (len(writes_all) > 1 or profiles):
+        values_cache = {}
 
-    def _evaluate_writes(writes_list):
+    def _reaches_quorum(writes_list):
+        # True iff ok/total >= qt over the writes whose value exists (total > 0).
+        # Stops reading as soon as the rest can't change that: accept once ok alone
+        # clears qt even if every remaining write counts against it; reject once
+        # qt is out of reach even if every remaining write counts for it.
         ok = 0
         total = 0
+        remaining = len(writes_list)
         for w in writes_list:
+            if ok and ok / float(total + remaining) >= qt:
+                return True
+            if (ok + remaining) / float(total + remaining) < qt:
+                return False
+            remaining -= 1
             subk = (w.get("subkey") or "").strip() or "FxProperties"
             name = (w.get("name") or "").strip().lower()
             if not name: continue
             base = _endpoint_base_path(device_id, flow, subk)
             if not base: continue
-            cu_val, cu_typ = _fast_read_one("HKCU", base, name)
-            lm_val, lm_typ = _fast_read_one("HKLM", base, name)
+            cu_val, cu_typ = _read_signature_value(device_id, flow, subk, base, "HKCU", name, values_cache)
+            lm_val, lm_typ = _read_signature_value(device_id, flow, subk, base, "HKLM", name, values_cache)
             if cu_typ is None and lm_typ is None:
                 continue
             total += 1
-            if _value_equals(w.get("enable"), w.get("type_enable"), cu_val, cu_typ) or \
-               _value_equals(w.get("enable"), w.get("type_enable"), lm_val, lm_typ):
+            if _value_equals(_write_payload(w, True), w.get("type_enable"), cu_val, cu_typ) or \
+               _value_equals(_write_payload(w, True), w.get("type_enable"), lm_val, lm_typ):
                 ok += 1
                 continue
-            if _value_equals(w.get("disable"), w.get("type_disable"), cu_val, cu_typ) or \
-               _value_equals(w.get("disable"), w.get("type_disable"), lm_val, lm_typ):
+            if _value_equals(_write_payload(w, False), w.get("type_disable"), cu_val, cu_typ) or \
+               _value_equals(_write_payload(w, False), w.get("type_disable"), lm_val, lm_typ):
                 ok += 1
                 continue
-        return total, ok
+        return total > 0 and (ok / float(total)) >= qt
 
     # Check individual profiles first
     for p_guid, p_writes in profiles.items():
-        tot, ok = _evaluate_writes(p_writes)
-        if tot > 0 and (ok / float(tot)) >= qt:
+        if _reaches_quorum(p_writes):
             return True
             
     # FALLBACK: If profiles failed, evaluate ALL writes together (the original method)
     # This guarantees we never break something that used to work!
-    tot, ok = _evaluate_writes(writes_all)
-    if tot > 0 and (ok / float(tot)) >= qt:
+    if _reaches_quorum(writes_all):
         return True
         
     return False
@@ -403,11 +455,11 @@ def _fx_write_matches_this_guid_now(w: dict, device_id: str, flow: str) -> bool:
             return False
         cu_val, cu_typ = _fast_read_one("HKCU", base, name)
         lm_val, lm_typ = _fast_read_one("HKLM", base, name)
-        if _value_equals(w.get("enable"), w.get("type_enable"), cu_val, cu_typ) or \
-           _value_equals(w.get("enable"), w.get("type_enable"), lm_val, lm_typ):
+        if _value_equals(_write_payload(w, True), w.get("type_enable"), cu_val, cu_typ) or \
+           _value_equals(_write_payload(w, True), w.get("type_enable"), lm_val, lm_typ):
             return True
-        if _value_equals(w.get("disable"), w.get("type_disable"), cu_val, cu_typ) or \
-           _value_equals(w.get("disable"), w.get("type_disable"), lm_val, lm_typ):
+        if _value_equals(_write_payload(w, False), w.get("type_disable"), cu_val, cu_typ) or \
+           _value_equals(_write_payload(w, False), w.get("type_disable"), lm_val, lm_typ):
             return True
     except Exception:
         return False
@@ -455,21 +507,14 @@ def _main_entry_signature_applies(entry: dict, device_id: str, flow: str) -> boo
         except Exception:
             return False
         # Read HKCU then HKLM (same policy as _read_vendor_entry_state)
-        for hive_name in ("HKCU", "HKLM"):
-            hive = winreg.HKEY_CURRENT_USER if hive_name == "HKCU" else winreg.HKEY_LOCAL_MACHINE
+        for _hive_name, hive in _HIVES:
             try:
                 with winreg.OpenKey(hive, base, 0, winreg.KEY_READ) as key:
                     val, typ = winreg.QueryValueEx(key, val_name)
-            except OSError:
-                continue
-            if typ != winreg.REG_DWORD:
-                continue
-            try:
-                v = int(val)
-            except Exception:
+                if typ == winreg.REG_DWORD and int(val) in (en_val, di_val):
+                    return True
+            except (OSError, TypeError, ValueError):
                 continue
-            if v == en_val or v == di_val:
-                return True
         return False
     except Exception:
         return False
@@ -481,13 +526,16 @@ def _fx_candidate_by_guid_or_pattern(entry: dict, guid_lc: str, device_name: str
     This is NOT truth; it only narrows candidates. Truth is signature check.
     """
     try:
-        devs = {d.lower() for d in (entry.get("devices") or [])}
+        devs = entry.get("devices_set")
+        if devs is None:
+            devs = {d.lower() for d in (entry.get("devices") or [])}
         if guid_lc and devs and guid_lc in devs:
             return True
         pat = (entry.get("device_name_pattern") or "").strip()
         if device_name and pat:
+            rx = _device_name_pattern_re(pat)
             try:
-                return re.search(pat, device_name, re.IGNORECASE) is not None
+                return rx is not None and rx.search(device_name) is not None
             except Exception:
                 return False
         return False
@@ -497,6 +545,32 @@ def _key_tuple(rec):
     # Snapshot records are keyed by (hive, flow, subkey, name). That identity is
     # stable across snapshots and is what we diff when learning.
     return (str(rec.get("hive")), str(rec.get("flow")), str(rec.get("subkey")), str(rec.get("name")))
+def _encode_dword(raw):
+    try:
+        return int(raw)
+    except (TypeError, ValueError):
+        return None
+def _encode_sz(raw):
+    return raw if isinstance(raw, str) else str(raw)
+def _encode_binary(raw):
+    # store as hex:aa,bb,... for readability
+    return _format_bin_hex(raw if isinstance(raw, str) else str(raw or ""))
+_ENCODERS = {
+    winreg.REG_DWORD: _encode_dword,
+    winreg.REG_SZ: _encode_sz,
+    winreg.REG_BINARY: _encode_binary,
+}
+def _encode_registry_value(typ, raw):
+    """
+    Snapshot payload -> INI-friendly value for learned writes:
+      DWORD -> int, SZ -> str, BINARY -> 'hex:aa,bb,..' (from dataRaw hex).
+    Returns None for unsupported types or payloads that cannot be encoded.
+    """
+    enc = _ENCODERS.get(typ)
+    # Unsupported types -> None
+    return enc(raw) if enc is not None else None
+# Endpoint subkeys that carry learnable toggles (str.startswith accepts the tuple).
+_MM_SUBKEY_PREFIXES = ("FxProperties", "Properties")
 def _index_registry_list(lst):
     idx = {}
     for e in (lst or []):
@@ -517,43 +591,39 @@ def _build_fx_multiwrite_from_snapshots(target, snapA, snapB):
       'enable','disable'   (value strings: int for DWORD, str for SZ, 'hex:..' for binary)
     }
     """
-    writes = []
-    A = _index_registry_list(snapA.get("registry") or [])
-    B = _index_registry_list(snapB.get("registry") or [])
-    all_keys = set(A.keys()) | set(B.keys())
-    for k in sorted(all_keys):
-        a = A.get(k); b = B.get(k)
+    changed = {}
+    # Only keys present on both sides matter (added/removed values are skipped), so
+    # stream A's rows once and probe an index of B's FxProperties/Properties rows;
+    # no union sort and no index for A. The few resulting writes are sorted by key
+    # at the end to keep INI output stable.
+    B = _index_registry_list(r for r in (snapB.get("registry") or [])
+                             if str(r.get("subkey")).startswith(_MM_SUBKEY_PREFIXES))
+    for a in (snapA.get("registry") or []):
+        # Only consider our two subkeys
+        if not str(a.get("subkey")).startswith(_MM_SUBKEY_PREFIXES):
+            continue
+        k = _key_tuple(a)
+        b = B.get(k)
         if not a or not b:
             # Changed existence (added/removed) – skip for now
             continue
-        # Only consider our two subkeys
-        sub = str(a.get("subkey") or "")
-        if not (sub.startswith("FxProperties") or sub.startswith("Properties")):
-            continue
         # Compare exact raw payloads
         type_a = a.get("type"); type_b = b.get("type")
         raw_a  = a.get("dataRaw"); raw_b  = b.get("dataRaw")
         if type_a == type_b and raw_a == raw_b:
             continue  # unchanged
+        enc_a = _ENCODERS.get(type_a)
+        enc_b = _ENCODERS.get(type_b)
+        if enc_a is None or enc_b is None:
+            # Skip if we cannot encode (unknown type)
+            continue
         hive, flow, subkey, name = k
-        def _encode_value(typ, raw):
-            if typ == winreg.REG_DWORD:
-                try: return int(raw)
-                except Exception: return None
-            if typ == winreg.REG_SZ:
-                try: return str(raw)
-                except Exception: return None
-            if typ == winreg.REG_BINARY:
-                # store as hex:aa,bb,... for readability
-                return _format_bin_hex(str(raw or ""))
-            # Unsupported types -> None
-            return None
-        v_enable = _encode_value(type_a, raw_a)
-        v_disable= _encode_value(type_b, raw_b)
+        v_enable = enc_a(raw_a)
+        v_disable= enc_b(raw_b)
         if v_enable is None or v_disable is None:
             # Skip if we cannot encode (unknown type)
             continue
-        writes.append({
+        changed[k] = {
             "hive": hive,  # "HKLM" or "HKCU"
             "subkey": subkey,  # "FxProperties" or "Properties"
             "name": name,      # "{fmtid},pid"
@@ -561,21 +631,217 @@ def _build_fx_multiwrite_from_snapshots(target, snapA, snapB):
             "type_disable": _reg_type_to_name(type_b),
             "enable": v_enable,
             "disable": v_disable,
-        })
-    return writes
-# --- Lightweight vendor DB cache (path + mtime -> parsed data) ---
-# Cache key:
-#   - absolute INI path
-#   - os.stat().st_mtime
+        }
+    return [changed[k] for k in sorted(changed)]
+# --- Lightweight vendor DB cache (path -> mtime/size/content hash -> parsed data) ---
+# Cache slots (one per absolute INI path, least recently used evicted first):
+#   - os.stat().st_mtime_ns / st_size: unchanged => reuse without reading the file
+#     (integer nanoseconds: the float st_mtime can round two quick saves together)
+#   - blake2b digest of the file bytes: unchanged => reuse without re-parsing
+#     (editor saves and `touch` bump mtime but usually keep identical content)
 #
 # Why:
 #   - GUI calls "fast" read helpers frequently; re-parsing the INI each time is wasteful.
 #   - When the file is missing, we cache mtime=None so we don't repeatedly hit the filesystem.
-_VENDOR_DB_CACHE = {
-    "path": None,
-    "mtime": None,
-    "data": {"main": [], "fx": []},
-}
+#   - Parsed data is frozen (read-only mappings, tuples) so every caller can share the
+#     cached objects; callers that need a variant copy with dict(entry) first.
+#   - A slot stat'ed less than _VENDOR_DB_STAT_TTL seconds ago is trusted without
+#     another os.stat (GUI polling); hand edits show up within that window, our own
+#     INI writers drop the slot via _forget_vendor_db, and force=True always stats.
+_VENDOR_DB_CACHE = {}
+_VENDOR_DB_CACHE_MAX = 4
+_VENDOR_DB_STAT_TTL = 2.0
+_EMPTY_VENDOR_DB = MappingProxyType({
+    "main": (), "fx": (),
+    "main_by_guid_flow": MappingProxyType({}), "fx_by_guid": MappingProxyType({}),
+    "fx_by_name": MappingProxyType({}),
+    "main_by_identity": MappingProxyType({}), "fx_by_identity": MappingProxyType({}),
+    "sections": frozenset(), "fx_buckets": MappingProxyType({}),
+})
+# (name, winreg root) in the default read order: HKCU first, then HKLM.
+_HIVES = (("HKCU", winreg.HKEY_CURRENT_USER), ("HKLM", winreg.HKEY_LOCAL_MACHINE))
+def _hive_handle(hive_name):
+    # Same rule every writer uses: "HKLM" selects HKLM, anything else HKCU.
+    return winreg.HKEY_LOCAL_MACHINE if (hive_name or "").strip().upper() == "HKLM" else winreg.HKEY_CURRENT_USER
+def _entry_write_hive_handles(entry):
+    """Registry roots _set_vendor_entry_state writes for an entry, in configured order."""
+    return tuple(_hive_handle(h) for h in (entry.get("hives") or ["HKCU", "HKLM"]))
+def _entry_hive_order(entry):
+    """
+    Read order for MAIN / legacy single-DWORD entries: configured HKCU/HKLM names,
+    de-duplicated, defaulting to HKCU then HKLM. Cached entries store it resolved
+    to winreg roots (hive_order_handles).
+    """
+    hive_order = []
+    for h in entry.get("hives") or ():
+        h_up = h.strip().upper()
+        if h_up in ("HKCU", "HKLM") and h_up not in hive_order:
+            hive_order.append(h_up)
+    return tuple(hive_order) or ("HKCU", "HKLM")
+def _freeze_write(w: dict):
+    out = {k: (tuple(v) if isinstance(v, list) else v) for k, v in w.items()}
+    if out.get("devices") is not None:
+        out["devices_set"] = frozenset(out["devices"])
+    out["hive_handle"] = _hive_handle(out.get("hive"))
+    # winreg type constants (None when the INI names an unsupported type)
+    for field in ("type_enable", "type_disable"):
+        out[field + "_code"] = _NAME_TO_TYPE.get((out.get(field) or "").strip().upper())
+    # Readback ranking, so sorting writes doesn't redo the string work per call
+    out["read_score"] = _fast_write_score(out)
+    # Normalized identity+payload for the learn/cleanup matchers (see _write_payload_key)
+    out["payload_key"] = _write_payload_key(out)
+    return MappingProxyType(out)
+def _build_write_profiles(writes):
+    """
+    Group multi-writes into per-device profiles: each GUID named by some
+    write{i}_devices maps to its scoped writes followed by every universal write
+    (devices unset). Profiles appear in first-seen GUID order.
+    """
+    profiles = {}
+    for w in writes:
+        devs = w.get("devices")
+        if devs is not None and len(devs) > 0:
+            for g in devs:
+                profiles.setdefault(g, []).append(w)
+    uni_writes = [w for w in writes if w.get("devices") is None]
+    return {g: tuple(ws) + tuple(uni_writes) for g, ws in profiles.items()}
+def _entry_write_profiles(entry):
+    """Per-device write profiles for an entry (load-time copy when available)."""
+    profiles = entry.get("write_profiles")
+    if profiles is None:
+        profiles = _build_write_profiles(entry.get("writes") or [])
+    return profiles
+def _freeze_vendor_entry(e: dict):
+    """
+    Return a read-only view of a parsed entry (lists -> tuples, writes -> read-only).
+    Adds devices_set / flows_set (and devices_set per scoped write) so membership
+    checks don't rebuild lowercased sets per call; GUIDs are already lowercased here.
+    Multi-write entries also get write_profiles (see _build_write_profiles) and
+    fast_probe (see _fast_probe_for_writes); FX entries get identity_key
+    (see _fx_identity_key) and the source='ini' tag FX lookups return.
+    """
+    out = {}
+    for k, v in e.items():
+        if k == "writes":
+            v = tuple(_freeze_write(w) for w in v)
+        elif isinstance(v, list):
+            v = tuple(v)
+        out[k] = v
+    if "devices" in out:
+        out["devices_set"] = frozenset(out["devices"])
+    if "flows" in out:
+        out["flows_set"] = frozenset(out["flows"])
+    if out.get("type") == "fx":
+        out["identity_key"] = _fx_identity_key(out)
+        out["source"] = "ini"
+    if out.get("writes"):
+        out["write_profiles"] = MappingProxyType(_build_write_profiles(out["writes"]))
+        out["fast_probe"] = _fast_probe_for_writes(out["writes"])
+    if "hives" in out:
+        # winreg roots resolved once (read order / write targets) for the hot loops
+        out["hive_order_handles"] = tuple(_hive_handle(h) for h in _entry_hive_order(out))
+        out["write_hive_handles"] = _entry_write_hive_handles(out)
+    return MappingProxyType(out)
+def _index_vendor_entries(main, fx):
+    """
+    Build the per-endpoint lookup tables stored alongside the frozen DB:
+      main_by_guid_flow[(guid_lc, "Render"|"Capture")] -> MAIN entries listing that GUID
+                                                          and allowing that flow
+      fx_by_guid[guid_lc] -> FX entries explicitly listing that GUID
+      fx_by_name[fx_name_lc] -> FX entries with that (stripped, lowercased) fx_name
+      main_by_identity[_main_identity_key] -> MAIN entries with that value/payload
+      fx_by_identity[identity_key] -> single-DWORD FX entries with that identity
+    Entries keep INI order within each bucket. The identity tables let learn find an
+    existing identical rule with one lookup instead of a pairwise scan.
+    """
+    main_idx = {}
+    for e in main:
+        flows = e.get("flows") or ("Render", "Capture")
+        for g in dict.fromkeys(e.get("devices") or ()):
+            for fl in flows:
+                main_idx.setdefault((g, fl), []).append(e)
+    main_ident = {}
+    for e in main:
+        key = _main_identity_key(e)
+        if key is not None:
+            main_ident.setdefault(key, []).append(e)
+    fx_idx = {}
+    fx_names = {}
+    fx_ident = {}
+    for e in fx:
+        for g in dict.fromkeys(e.get("devices") or ()):
+            fx_idx.setdefault(g, []).append(e)
+        fx_names.setdefault((e.get("fx_name") or "").strip().lower(), []).append(e)
+        if not e.get("multi_write"):
+            fx_ident.setdefault(_entry_fx_identity_key(e, False), []).append(e)
+    def _frozen(idx):
+        return MappingProxyType({k: tuple(v) for k, v in idx.items()})
+    return {
+        "main_by_guid_flow": _frozen(main_idx),
+        "fx_by_guid": _frozen(fx_idx),
+        "fx_by_name": _frozen(fx_names),
+        "main_by_identity": _frozen(main_ident),
+        "fx_by_identity": _frozen(fx_ident),
+    }
+def _vendor_db_cache_put(path, mtime, size, digest, data, ino=None):
+    _VENDOR_DB_CACHE.pop(path, None)
+    _VENDOR_DB_CACHE[path] = {"mtime": mtime, "size": size, "ino": ino, "hash": digest, "data": data,
+                              "stat_at": time.monotonic()}
+    while len(_VENDOR_DB_CACHE) > _VENDOR_DB_CACHE_MAX:
+        _VENDOR_DB_CACHE.pop(next(iter(_VENDOR_DB_CACHE)))
+    return data
+def _forget_vendor_db(ini_path):
+    """Drop the cache slot for an INI we just rewrote so the next load re-stats it."""
+    try:
+        _VENDOR_DB_CACHE.pop(os.path.abspath(ini_path), None)
+    except Exception:
+        pass
+def _write_ini_lines(ini_path, lines):
+    """
+    Replace the INI with lines: one write to a sibling temp file, then os.replace.
+    Why:
+      Rewriting in place truncates first, so a crash or a full disk mid-write
+      leaves a partial INI (and every learned entry after the cut is lost).
+    The temp file is removed if anything fails before the replace.
+    """
+    tmp = f"{ini_path}.tmp.{os.getpid()}"
+    try:
+        with open(tmp, "w", encoding="utf-8", errors="replace") as f:
+            f.write("".join(lines))
+        os.replace(tmp, ini_path)
+    except BaseException:
+        try:
+            os.remove(tmp)
+        except OSError:
+            pass
+        raise
+# --- Default INI path cache ---
+# The write-probe behind _vendor_ini_default_path (makedirs + create + unlink) is
+# stable for the life of the process in practice, but the path is resolved on
+# every _load_vendor_db_split call without an explicit ini_path (GUI polling).
+# Cache the resolved path for a TTL and each directory's probe result.
+_DEFAULT_INI_PATH_CACHE = {"path": None, "at": 0.0}
+_DEFAULT_INI_PATH_TTL = 60.0
+_WRITABLE_DIR_CACHE = {}
+def _is_writable_dir(path_dir):
+    cached = _WRITABLE_DIR_CACHE.get(path_dir)
+    if cached is not None:
+        return cached
+    # Create/remove a real probe file: on Windows os.access(W_OK) only looks at the
+    # read-only attribute, not ACLs, so it reports Program Files as writable. Nothing
+    # retries a failed learn write elsewhere, so this probe is what routes protected
+    # installs to %LOCALAPPDATA%. Cached per directory, so it runs once.
+    try:
+        os.makedirs(path_dir, exist_ok=True)
+        probe = os.path.join(path_dir, ".writetest")
+        with open(probe, "w", encoding="utf-8") as _:
+            pass
+        os.remove(probe)
+        ok = True
+    except Exception:
+        ok = False
+    _WRITABLE_DIR_CACHE[path_dir] = ok
+    return ok
 def _vendor_ini_default_path():
     """
     Return a default vendor_toggles.ini path:
@@ -585,17 +851,17 @@ def _vendor_ini_default_path():
       The EXE directory may be under Program Files (not writable without elevation).
       Learn flows need to append/update the INI, so we prefer a per-user writable location
       when the EXE directory is not writable.
-    """
-    def _is_writable_dir(path_dir):
-        try:
-            os.makedirs(path_dir, exist_ok=True)
-            probe = os.path.join(path_dir, ".writetest")
-            with open(probe, "w", encoding="utf-8") as _:
-                pass
-            os.remove(probe)
-            return True
-        except Exception:
-            return False
+    The result is cached for _DEFAULT_INI_PATH_TTL seconds (see above).
+    """
+    now = time.monotonic()
+    cached = _DEFAULT_INI_PATH_CACHE["path"]
+    if cached is not None and (now - _DEFAULT_INI_PATH_CACHE["at"]) < _DEFAULT_INI_PATH_TTL:
+        return cached
+    path = _resolve_vendor_ini_default_path()
+    _DEFAULT_INI_PATH_CACHE["path"] = path
+    _DEFAULT_INI_PATH_CACHE["at"] = now
+    return path
+def _resolve_vendor_ini_default_path():
     try:
         base = _exe_dir()
     except Exception:
@@ -621,11 +887,77 @@ def _vendor_ini_default_path():
     except Exception:
         pass
     return os.path.join(fallback_dir, "vendor_toggles.ini")
-def _load_vendor_db_split(ini_path=None):
+def _scan_ini_sections(text):
+    """
+    Split INI text into {section: {key: value}} in a single pass.
+    Why:
+      _load_vendor_db_split only needs flat key=value pairs under [section]
+      headers; ConfigParser's per-line regex machinery dominated cache-miss cost.
+    Mirrors the ConfigParser defaults we relied on: keys are lowercased, keys and
+    values are stripped, the first '=' or ':' splits the pair, full-line '#'/';'
+    comments are skipped, lines indented deeper than their key line continue its
+    value (joined with newlines, blank lines kept inside, trailing ones dropped),
+    and [DEFAULT] keys are inherited by every section that doesn't set them.
+    Differences (the loader used to reject these files outright, loading nothing):
+      - duplicate sections/keys merge, later keys winning (logged with _dbg);
+      - key lines without a delimiter and keys before any header are ignored;
+      - no '%' interpolation: values are taken verbatim.
+    """
+    sections = {}
+    defaults = {}
+    cur = None
+    key = None          # option whose value continuation lines extend
+    key_indent = 0
+    for line in text.lstrip("\ufeff").splitlines():
+        t = line.strip()
+        if not t:
+            if key is not None:
+                cur[key].append("")
+            continue
+        if t[0] in "#;":
+            continue
+        indent = len(line) - len(line.lstrip())
+        if key is not None and indent > key_indent:
+            cur[key].append(t)
+            continue
+        key = None
+        key_indent = indent
+        if t[0] == "[" and t[-1] == "]":
+            name = t[1:-1]
+            if name == "DEFAULT":
+                cur = defaults
+            else:
+                if name in sections:
+                    _dbg(f"vendor INI: duplicate section [{name}] merged into the first")
+                cur = sections.setdefault(name, {})
+            continue
+        if cur is None:
+            continue
+        eq = t.find("=")
+        col = t.find(":")
+        if eq < 0 or (0 <= col < eq):
+            eq = col
+        if eq <= 0:
+            continue
+        key = t[:eq].rstrip().lower()
+        if key in cur:
+            _dbg(f"vendor INI: duplicate key '{key}' merged (last value wins)")
+        cur[key] = [t[eq + 1:].lstrip()]
+    out = {}
+    for name, opts in sections.items():
+        merged = {k: "\n".join(v).rstrip() for k, v in defaults.items()}
+        for k, v in opts.items():
+            merged[k] = "\n".join(v).rstrip()
+        out[name] = merged
+    return out
+def _load_vendor_db_split(ini_path=None, force=False):
     r"""
-    Load vendor toggles from INI. Returns dict with 'main' and 'fx' lists.
-    Uses a lightweight cache keyed by (absolute path, mtime) so we don't
-    re-parse or re-fail on a missing file for every CLI call.
+    Load vendor toggles from INI. Returns a read-only mapping with 'main' and 'fx'
+    tuples of read-only entries (copy with dict(entry) before modifying).
+    Uses a lightweight cache keyed by absolute path and validated by mtime/size/inode,
+    then by content hash, so we don't re-parse or re-fail on a missing file for
+    every CLI call. Within _VENDOR_DB_STAT_TTL of the last stat the cached DB is
+    returned without touching the filesystem unless force=True.
     INI schema summary (debugger-oriented):
       MAIN entry (type default is main):
         - [section]
@@ -657,53 +989,60 @@ def _load_vendor_db_split(ini_path=None):
             * list    => applies only to those GUIDs
         - decider_index and quorum_threshold control verification/readback behavior
     """
-    global _VENDOR_DB_CACHE
     # Resolve path
     path = os.path.abspath(ini_path or _vendor_ini_default_path())
+    slot = _VENDOR_DB_CACHE.get(path)
+    if slot is not None and not force and (time.monotonic() - slot["stat_at"]) < _VENDOR_DB_STAT_TTL:
+        return slot["data"]
     # Check file existence & mtime up front
     try:
         st = os.stat(path)
-        mtime = st.st_mtime
+        mtime = st.st_mtime_ns
+        size = st.st_size
+        # INI rewrites land via os.replace (new file), so the inode changes even when
+        # mtime resolution and size can't tell the new file from the old one.
+        ino = st.st_ino
         exists = True
     except OSError:
         exists = False
         mtime = None
+        size = None
+        ino = None
     # If file does not exist, cache and return empty DB
     if not exists:
-        if (_VENDOR_DB_CACHE.get("path") == path and
-                _VENDOR_DB_CACHE.get("mtime") is None):
+        if slot is not None and slot["mtime"] is None:
             # Already know it's missing; reuse empty DB
-            return _VENDOR_DB_CACHE.get("data") or {"main": [], "fx": []}
-        _VENDOR_DB_CACHE["path"] = path
-        _VENDOR_DB_CACHE["mtime"] = None
-        _VENDOR_DB_CACHE["data"] = {"main": [], "fx": []}
-        return _VENDOR_DB_CACHE["data"]
-    # If path and mtime match cache, reuse parsed DB
-    if (_VENDOR_DB_CACHE.get("path") == path and
-            _VENDOR_DB_CACHE.get("mtime") == mtime):
-        return _VENDOR_DB_CACHE.get("data") or {"main": [], "fx": []}
-    # Otherwise parse INI fresh (same logic as before)
-    cfg = configparser.ConfigParser()
-    entries = {"main": [], "fx": []}
+            slot["stat_at"] = time.monotonic()
+            return slot["data"]
+        return _vendor_db_cache_put(path, None, None, None, _EMPTY_VENDOR_DB)
+    # If mtime, size and inode match cache, reuse parsed DB without touching the file
+    if slot is not None and slot["mtime"] == mtime and slot["size"] == size and slot["ino"] == ino:
+        slot["stat_at"] = time.monotonic()
+        return slot["data"]
     try:
-        cfg.read(path, encoding="utf-8")
+        with open(path, "rb") as f:
+            raw = f.read()
     except Exception:
         # On read failure, cache empty DB so we don't hammer again
-        _VENDOR_DB_CACHE["path"] = path
-        _VENDOR_DB_CACHE["mtime"] = mtime
-        _VENDOR_DB_CACHE["data"] = entries
-        return entries
-    for sec in cfg.sections():
+        return _vendor_db_cache_put(path, mtime, size, None, _EMPTY_VENDOR_DB, ino)
+    # Same bytes as the cached parse (e.g. touched or re-saved unchanged): keep it
+    digest = hashlib.blake2b(raw, digest_size=16).digest()
+    if slot is not None and slot["hash"] == digest:
+        return _vendor_db_cache_put(path, mtime, size, digest, slot["data"], ino)
+    # Otherwise parse INI fresh (same logic as before)
+    entries = {"main": [], "fx": []}
+    sections = _scan_ini_sections(raw.decode("utf-8", "replace"))
+    for sec, opts in sections.items():
         try:
-            entry_type = cfg.get(sec, "type", fallback="main").strip().lower()
-            notes = cfg.get(sec, "notes", fallback="")
+            entry_type = opts.get("type", "main").strip().lower()
+            notes = opts.get("notes", "")
             if entry_type == "fx":
                 # FX entry: could be single-DWORD or multi-write (existing behavior)
-                fx_name = cfg.get(sec, "fx_name", fallback="").strip()
-                devpat = cfg.get(sec, "device_name_pattern", fallback="").strip()  # optional in new model
+                fx_name = opts.get("fx_name", "").strip()
+                devpat = opts.get("device_name_pattern", "").strip()  # optional in new model
                 if not fx_name:
                     continue
-                devices_text = cfg.get(sec, "devices", fallback="").strip()
+                devices_text = opts.get("devices", "").strip()
                 devices = [x.strip().lower() for x in devices_text.split(",") if x.strip()]
                 e = {
                     "name": sec,
@@ -713,11 +1052,11 @@ def _load_vendor_db_split(ini_path=None):
                     "notes": notes or "",
                     "devices": devices,
                 }
-                multi_write = cfg.get(sec, "multi_write", fallback="0").strip()
+                multi_write = opts.get("multi_write", "0").strip()
                 if multi_write in ("1", "true", "yes"):
-                    write_count = int(cfg.get(sec, "write_count", fallback="0") or "0")
-                    decider_index = int(cfg.get(sec, "decider_index", fallback="1") or "1")
-                    quorum_text = cfg.get(sec, "quorum_threshold", fallback="0.60").strip()
+                    write_count = int(opts.get("write_count", "0") or "0")
+                    decider_index = int(opts.get("decider_index", "1") or "1")
+                    quorum_text = opts.get("quorum_threshold", "0.60").strip()
                     try:
                         quorum_threshold = float(quorum_text)
                     except Exception:
@@ -727,19 +1066,19 @@ def _load_vendor_db_split(ini_path=None):
                         continue
                     writes = []
                     for i in range(1, write_count + 1):
-                        hive = cfg.get(sec, f"write{i}_hive").strip().upper()
-                        subk = cfg.get(sec, f"write{i}_subkey").strip()
-                        name = cfg.get(sec, f"write{i}_name").strip().lower()
-                        t_en = cfg.get(sec, f"write{i}_type_enable").strip().upper()
-                        t_di = cfg.get(sec, f"write{i}_type_disable").strip().upper()
-                        v_en = cfg.get(sec, f"write{i}_enable").strip()
-                        v_di = cfg.get(sec, f"write{i}_disable").strip()
+                        hive = opts[f"write{i}_hive"].strip().upper()
+                        subk = opts[f"write{i}_subkey"].strip()
+                        name = opts[f"write{i}_name"].strip().lower()
+                        t_en = opts[f"write{i}_type_enable"].strip().upper()
+                        t_di = opts[f"write{i}_type_disable"].strip().upper()
+                        v_en = opts[f"write{i}_enable"].strip()
+                        v_di = opts[f"write{i}_disable"].strip()
                         # NEW: optional per-toggle devices list
                         # Semantics:
                         #   - missing => universal within this FX bucket
                         #   - empty   => applies to nobody
                         #   - list    => applies only to those GUIDs
-                        raw_devices = cfg.get(sec, f"write{i}_devices", fallback=None)
+                        raw_devices = opts.get(f"write{i}_devices", None)
                         if raw_devices is None:
                             devs = None            # universal (applies to all)
                         else:
@@ -757,25 +1096,28 @@ def _load_vendor_db_split(ini_path=None):
                             "enable": v_en,
                             "disable": v_di,
                             "devices": devs,  # None=universal, []=none, list=[guids]
+                            # Decoded once here so apply/readback don't re-parse hex:/int text
+                            "enable_data": _decode_write_payload(t_en, v_en),
+                            "disable_data": _decode_write_payload(t_di, v_di),
                         })
                     e["multi_write"] = True
                     e["writes"] = writes
                     e["decider_index"] = max(1, decider_index)
                     e["quorum_threshold"] = quorum_threshold
-                    e["flows"] = [x.strip().capitalize() for x in cfg.get(sec, "flows", fallback="Render,Capture").split(",") if x.strip()]
-                    e["hives"] = [x.strip().upper() for x in cfg.get(sec, "hives", fallback="HKLM,HKCU").split(",") if x.strip()]
+                    e["flows"] = [x.strip().capitalize() for x in opts.get("flows", "Render,Capture").split(",") if x.strip()]
+                    e["hives"] = [x.strip().upper() for x in opts.get("hives", "HKLM,HKCU").split(",") if x.strip()]
                 else:
-                    value_name = cfg.get(sec, "value_name").strip().lower()
-                    en = int(cfg.get(sec, "dword_enable"))
-                    di = int(cfg.get(sec, "dword_disable"))
+                    value_name = opts["value_name"].strip().lower()
+                    en = int(opts["dword_enable"])
+                    di = int(opts["dword_disable"])
                     if en not in (0,1) or di not in (0,1) or en == di:
                         continue
                     e.update({
                         "value_name": value_name,
                         "enable": en,
                         "disable": di,
-                        "hives": [x.strip().upper() for x in cfg.get(sec, "hives", fallback="HKLM,HKCU").split(",") if x.strip()],
-                        "flows": [x.strip().capitalize() for x in cfg.get(sec, "flows", fallback="Render,Capture").split(",") if x.strip()],
+                        "hives": [x.strip().upper() for x in opts.get("hives", "HKLM,HKCU").split(",") if x.strip()],
+                        "flows": [x.strip().capitalize() for x in opts.get("flows", "Render,Capture").split(",") if x.strip()],
                         "multi_write": False,
                     })
                 # Keep all parsed FX sections; discovery is based on signature,
@@ -783,16 +1125,16 @@ def _load_vendor_db_split(ini_path=None):
                 entries["fx"].append(e)
             else:
                 # MAIN entry (supports optional subkey)
-                value_name = cfg.get(sec, "value_name").strip().lower()
-                en = int(cfg.get(sec, "dword_enable"))
-                di = int(cfg.get(sec, "dword_disable"))
+                value_name = opts["value_name"].strip().lower()
+                en = int(opts["dword_enable"])
+                di = int(opts["dword_disable"])
                 if en not in (0, 1) or di not in (0, 1) or en == di:
                     continue
-                hives = [x.strip().upper() for x in cfg.get(sec, "hives", fallback="HKLM,HKCU").split(",") if x.strip()]
-                flows = [x.strip().capitalize() for x in cfg.get(sec, "flows", fallback="Render,Capture").split(",") if x.strip()]
-                devices_text = cfg.get(sec, "devices", fallback="").strip()
+                hives = [x.strip().upper() for x in opts.get("hives", "HKLM,HKCU").split(",") if x.strip()]
+                flows = [x.strip().capitalize() for x in opts.get("flows", "Render,Capture").split(",") if x.strip()]
+                devices_text = opts.get("devices", "").strip()
                 devices = [x.strip().lower() for x in devices_text.split(",") if x.strip()]
-                subkey_txt = cfg.get(sec, "subkey", fallback="FxProperties").strip()
+                subkey_txt = opts.get("subkey", "FxProperties").strip()
                 subkey_norm = "Properties" if subkey_txt.lower().startswith("prop") else "FxProperties"
                 entry = {
                     "name": sec,
@@ -810,11 +1152,24 @@ def _load_vendor_db_split(ini_path=None):
                     entries["main"].append(entry)
         except Exception:
             continue
-    # Update cache with newly parsed DB
-    _VENDOR_DB_CACHE["path"] = path
-    _VENDOR_DB_CACHE["mtime"] = mtime
-    _VENDOR_DB_CACHE["data"] = entries
-    return entries
+    # Update cache with newly parsed (frozen) DB
+    main = tuple(_freeze_vendor_entry(e) for e in entries["main"])
+    fx = tuple(_freeze_vendor_entry(e) for e in entries["fx"])
+    fx_buckets = {}
+    for sec, opts in sections.items():
+        if opts.get("type", "").lower() == "fx":
+            fx_buckets.setdefault(opts.get("fx_name", "").lower(), sec)
+    data = MappingProxyType({
+        "main": main,
+        "fx": fx,
+        **_index_vendor_entries(main, fx),
+        # Every [section] in the file, including ones skipped as invalid above
+        "sections": frozenset(sections),
+        # fx_name (lowercased) -> first type=fx section using it, valid or not
+        "fx_buckets": MappingProxyType(fx_buckets),
+    })
+    return _vendor_db_cache_put(path, mtime, size, digest, data, ino)
+@functools.lru_cache(maxsize=256)
 def _endpoint_fx_key(device_id, flow):
     guid = _extract_endpoint_guid_from_device_id(device_id)
     if not guid:
@@ -843,13 +1198,72 @@ def _vendor_entry_applies(entry, device_id, flow):
     if not guid:
         return False
     # Device membership
-    devs = set((entry.get("devices") or []))
-    if not devs or guid.lower() not in {d.lower() for d in devs}:
+    devs = entry.get("devices_set")
+    if devs is None:
+        devs = {d.lower() for d in (entry.get("devices") or [])}
+    if not devs or guid.lower() not in devs:
         return False
     # Flow membership
     flow_name = "Render" if str(flow).lower().startswith("r") else "Capture"
-    if entry.get("flows") and flow_name not in entry["flows"]:
+    flows = entry.get("flows_set") or entry.get("flows")
+    if flows and flow_name not in flows:
         return False
+    return _vendor_entry_value_exists(entry, device_id, flow)
+def _vendor_entries_for_endpoint(db, device_id, flow):
+    """
+    MAIN entries whose devices list contains this endpoint's GUID and whose flows
+    allow this flow, in INI order (O(1) lookup in the index built at load time).
+    """
+    guid = _extract_endpoint_guid_from_device_id(device_id)
+    if not guid:
+        return ()
+    flow_name = "Render" if str(flow).lower().startswith("r") else "Capture"
+    return (db.get("main_by_guid_flow") or {}).get((guid.lower(), flow_name), ())
+# Applying-entry decisions per (device_id, flow), remembered with the DB object they
+# were computed from. Membership is pure over the DB, but value existence is a live
+# registry read, so results expire after _FAST_READ_TTL and our own writes drop them
+# (see _forget_fast_reads); a DB reload yields a new object, which misses.
+_APPLIES_CACHE = {}
+_APPLIES_CACHE_MAX = 256
+def _vendor_entries_applying(db, device_id, flow):
+    """
+    Batch form of _vendor_entry_applies over this endpoint's indexed MAIN candidates.
+    Opens each HKCU subkey (FxProperties, Properties) once and enumerates its value
+    names into a set, instead of one OpenKey/QueryValueEx pair per entry and subkey.
+    Returns the applying entries in INI order.
+    """
+    flow_name = "Render" if str(flow).lower().startswith("r") else "Capture"
+    ck = (device_id, flow_name)
+    now = time.monotonic()
+    hit = _APPLIES_CACHE.get(ck)
+    if hit is not None and hit[0] is db and (now - hit[1]) < _FAST_READ_TTL:
+        return list(hit[2])
+    applying = _scan_vendor_entries_applying(db, device_id, flow)
+    if len(_APPLIES_CACHE) >= _APPLIES_CACHE_MAX:
+        _APPLIES_CACHE.clear()
+    _APPLIES_CACHE[ck] = (db, now, tuple(applying))
+    return applying
+def _scan_vendor_entries_applying(db, device_id, flow):
+    candidates = _vendor_entries_for_endpoint(db, device_id, flow)
+    if not candidates:
+        return []
+    present = set()
+    for sub in ("FxProperties", "Properties"):
+        base = _endpoint_base_path(device_id, flow, sub)
+        if not base:
+            continue
+        try:
+            with winreg.OpenKey(winreg.HKEY_CURRENT_USER, base, 0, winreg.KEY_READ) as key:
+                for i in range(winreg.QueryInfoKey(key)[1]):
+                    try:
+                        present.add(winreg.EnumValue(key, i)[0].lower())
+                    except OSError:
+                        break
+        except OSError:
+            pass
+    return [e for e in candidates if (e.get("value_name") or "").strip().lower() in present]
+def _vendor_entry_value_exists(entry, device_id, flow):
+    """HKCU existence probe used by _vendor_entry_applies (membership already checked)."""
     value_name = (entry.get("value_name") or "").strip().lower()
     if not value_name:
         return False
@@ -882,28 +1296,23 @@ def _set_vendor_entry_state(entry, device_id, flow, enable):
     base = _endpoint_base_path(device_id, flow, subkey)
     if not base:
         return False
-    desired = entry["enable"] if enable else entry["disable"]
+    desired = int(entry["enable"] if enable else entry["disable"])
     ok = False
-    for h in (entry.get("hives") or ["HKCU", "HKLM"]):
-        hive = winreg.HKEY_LOCAL_MACHINE if h.upper() == "HKLM" else winreg.HKEY_CURRENT_USER
+    for hive in (entry.get("write_hive_handles") or _entry_write_hive_handles(entry)):
         try:
             with winreg.OpenKey(hive, base, 0, winreg.KEY_SET_VALUE) as key:
-                winreg.SetValueEx(key, entry["value_name"], 0, winreg.REG_DWORD, int(desired))
-                ok = True or ok
+                winreg.SetValueEx(key, entry["value_name"], 0, winreg.REG_DWORD, desired)
+                ok = True
         except OSError:
             continue
+    _forget_fast_reads()
     return ok
 def _append_fx_ini_entry(ini_path, section_name, fx_name, device_name,
                          value_name, dword_enable, dword_disable,
                          flows, hives, notes):
     r"""Append FX entry to INI. Raises ValueError if section exists."""
-    cfg = configparser.ConfigParser()
-    try:
-        if os.path.exists(ini_path):
-            cfg.read(ini_path, encoding="utf-8")
-    except Exception:
-        pass
-    if cfg.has_section(section_name):
+    # Duplicate check against the cached parse (all section names, valid or not)
+    if section_name in _load_vendor_db_split(ini_path, force=True).get("sections", ()):
         raise ValueError(f"Section {section_name} already exists in INI")
     # Ensure directory exists
     try:
@@ -928,6 +1337,7 @@ def _append_fx_ini_entry(ini_path, section_name, fx_name, device_name,
     ]
     with open(ini_path, "a", encoding="utf-8", errors="replace") as f:
         f.write("\n".join(lines) + "\n")
+    _forget_vendor_db(ini_path)
 def _append_fx_ini_entry_multi(ini_path, section_name, fx_name, device_name, writes, notes=""):
     r"""
     Append an FX multi-write section. Raises ValueError if section exists.
@@ -955,13 +1365,8 @@ def _append_fx_ini_entry_multi(ini_path, section_name, fx_name, device_name, wri
           empty   => applies to nobody
           list    => applies only to those GUIDs
     """
-    cfg = configparser.ConfigParser()
-    try:
-        if os.path.exists(ini_path):
-            cfg.read(ini_path, encoding="utf-8")
-    except Exception:
-        pass
-    if cfg.has_section(section_name):
+    # Duplicate check against the cached parse (all section names, valid or not)
+    if section_name in _load_vendor_db_split(ini_path, force=True).get("sections", ()):
         raise ValueError(f"Section {section_name} already exists in INI")
     try:
         ini_dir = os.path.dirname(ini_path)
@@ -995,7 +1400,58 @@ def _append_fx_ini_entry_multi(ini_path, section_name, fx_name, device_name, wri
     lines.append("devices = ")
     with open(ini_path, "a", encoding="utf-8", errors="replace") as f:
         f.write("\n".join(lines) + "\n")
-def _read_vendor_entry_state(entry, device_id, flow):
+    _forget_vendor_db(ini_path)
+def _snapshot_endpoint_values(device_id, flow, subkey, hive):
+    """
+    Read every value under one endpoint subkey with a single OpenKey + EnumValue pass.
+    Returns {value_name_lower: (data, type)} or None if the key can't be opened.
+    """
+    base = _endpoint_base_path(device_id, flow, subkey)
+    if not base:
+        return None
+    out = {}
+    try:
+        with winreg.OpenKey(hive, base, 0, winreg.KEY_READ) as key:
+            for i in range(winreg.QueryInfoKey(key)[1]):
+                try:
+                    name, data, typ = winreg.EnumValue(key, i)
+                except OSError:
+                    break
+                out[name.lower()] = (data, typ)
+    except OSError:
+        return None
+    return out
+def _read_endpoint_value(device_id, flow, subkey, hive, name_lc, values_cache=None):
+    """
+    Single endpoint value read -> (value, type), or None if the key/value is missing.
+    values_cache (a dict owned by a batch caller, e.g. listing every FX of one device)
+    holds one _snapshot_endpoint_values result per (hive, subkey), so repeated reads
+    under the same key become dict lookups. Don't share it across polls/verifies.
+    """
+    if values_cache is not None:
+        ck = (hive, subkey, device_id, flow)
+        if ck not in values_cache:
+            values_cache[ck] = _snapshot_endpoint_values(device_id, flow, subkey, hive)
+        return (values_cache[ck] or {}).get(name_lc)
+    base = _endpoint_base_path(device_id, flow, subkey)
+    if not base:
+        return None
+    try:
+        with winreg.OpenKey(hive, base, 0, winreg.KEY_READ) as key:
+            return winreg.QueryValueEx(key, name_lc)
+    except OSError:
+        return None
+def _read_signature_value(device_id, flow, subkey, base, hive_name, name_lc, values_cache=None):
+    """
+    _fast_read_one for the signature checks -> (value, type) or (None, None); with a
+    values_cache the read is served from that batch's per-key snapshot instead.
+    """
+    if values_cache is None:
+        return _fast_read_one(hive_name, base, name_lc)
+    hive = winreg.HKEY_LOCAL_MACHINE if hive_name == "HKLM" else winreg.HKEY_CURRENT_USER
+    got = _read_endpoint_value(device_id, flow, subkey, hive, name_lc, values_cache)
+    return got if got is not None else (None, None)
+def _read_vendor_entry_state(entry, device_id, flow, values_cache=None):
     r"""
     Return True if current state equals 'enable' value, False if equals 'disable', None otherwise.
     Behavior:
@@ -1004,12 +1460,24 @@ def _read_vendor_entry_state(entry, device_id, flow):
           Read exactly the learned scope:
             HKCU\...\{FxProperties|Properties}\value_name for THIS endpoint,
           fallback to HKLM only if HKCU read is not present.
+    values_cache: optional per-batch dict, see _read_endpoint_value.
     """
     # Multi-write FX: state is determined via decider/quorum logic because multiple
     # values can represent one effect state.
     if entry.get("type") == "fx" and entry.get("multi_write"):
-        return _read_decider_state(entry, device_id, flow)
+        return _read_decider_state(entry, device_id, flow, values_cache=values_cache)
     # MAIN (enhancements) or legacy single-DWORD FX
+    plan = _vendor_dword_plan(entry, device_id, flow)
+    if plan is None:
+        return None
+    return _probe_vendor_dword(plan, device_id, flow, values_cache)
+def _vendor_dword_plan(entry, device_id, flow):
+    """
+    Resolve what _read_vendor_entry_state probes for a single-DWORD entry:
+    (subkey, base, hive handles in read order, value name, enable, disable),
+    or None if the entry/endpoint can't be read. Pure over its inputs, so a
+    polling caller resolves it once and probes repeatedly.
+    """
     val_name = (entry.get("value_name") or "").strip().lower()
     if not val_name:
         return None
@@ -1019,20 +1487,9 @@ def _read_vendor_entry_state(entry, device_id, flow):
     if not base:
         return None
     # Prefer HKCU, then HKLM if HKCU missing
-    hive_order = []
-    configured = entry.get("hives") or []
-    if configured:
-        seen = set()
-        for h in configured:
-            h_up = h.strip().upper()
-            if h_up in ("HKCU", "HKLM") and h_up not in seen:
-                hive_order.append(h_up); seen.add(h_up)
-    if not hive_order:
-        hive_order = ["HKCU", "HKLM"]
-    hive_map = {
-        "HKCU": winreg.HKEY_CURRENT_USER,
-        "HKLM": winreg.HKEY_LOCAL_MACHINE,
-    }
+    hive_handles = entry.get("hive_order_handles")
+    if hive_handles is None:
+        hive_handles = tuple(_hive_handle(h) for h in _entry_hive_order(entry))
     # Accept either key naming for enable/disable
     try:
         en = int(entry.get("enable"))
@@ -1043,49 +1500,73 @@ def _read_vendor_entry_state(entry, device_id, flow):
             di = int(entry.get("dword_disable"))
         except Exception:
             return None
-    for hname in hive_order:
-        hive = hive_map.get(hname)
-        if hive is None:
-            continue
+    return (subkey, base, hive_handles, val_name, en, di)
+def _probe_vendor_dword(plan, device_id, flow, values_cache=None):
+    """One state read (True/False/None) for a _vendor_dword_plan result."""
+    subkey, base, hive_handles, val_name, en, di = plan
+    for hive in hive_handles:
         try:
-            with winreg.OpenKey(hive, base, 0, winreg.KEY_READ) as key:
-                try:
-                    val, typ = winreg.QueryValueEx(key, val_name)
-                except FileNotFoundError:
+            if values_cache is not None:
+                got = _read_endpoint_value(device_id, flow, subkey, hive, val_name, values_cache)
+                if got is None:
                     continue
-        except OSError:
-            continue
-        if typ != winreg.REG_DWORD:
-            continue
-        try:
+                val, typ = got
+            else:
+                with winreg.OpenKey(hive, base, 0, winreg.KEY_READ) as key:
+                    val, typ = winreg.QueryValueEx(key, val_name)
+            if typ != winreg.REG_DWORD:
+                continue
             v = int(val)
-        except Exception:
+        except (OSError, TypeError, ValueError):
             continue
         if v == en:
             return True
         if v == di:
             return False
     return None
+# Backoff steps (seconds) between verify probes while the value still disagrees.
+_VERIFY_BACKOFF = (0.005, 0.01, 0.025, 0.05, 0.1)
 def _verify_vendor_entry(entry, device_id, flow, expected_enabled, timeout=2.5, interval=0.2, consecutive=2):
     """
     Poll the same vendor DWORD until it reflects expected_enabled for 'consecutive' reads or timeout.
     Why consecutive reads:
       Some drivers update multiple keys asynchronously; requiring the same answer
       multiple times avoids transient states being reported as final.
-    """
-    end = time.time() + float(timeout)
+    Polling schedule:
+      Probe immediately, then back off through _VERIFY_BACKOFF (capped at 'interval')
+      while the value disagrees, so the first match is seen soon after the driver
+      writes it. Confirming reads stay 'interval' apart: that spacing is what lets
+      the asynchronous updates above surface as a mismatch. A mismatch after a match
+      restarts the backoff from its first step. Sleeps never overshoot the deadline.
+    """
+    # Single-DWORD entries: resolve the probe once instead of per poll.
+    read_state = functools.partial(_read_vendor_entry_state, entry, device_id, flow)
+    if not (entry.get("type") == "fx" and entry.get("multi_write")):
+        plan = _vendor_dword_plan(entry, device_id, flow)
+        if plan is not None:
+            read_state = functools.partial(_probe_vendor_dword, plan, device_id, flow)
+    end = time.monotonic() + float(timeout)
+    interval = float(interval)
+    step = 0
     ok_streak = 0
     last = None
-    while time.time() < end:
-        st = _read_vendor_entry_state(entry, device_id, flow)
+    while True:
+        st = read_state()
         last = st
         if st is not None and st == bool(expected_enabled):
             ok_streak += 1
             if ok_streak >= consecutive:
                 return True, st
+            delay = interval
+            step = 0
         else:
             ok_streak = 0
-        time.sleep(interval)
+            delay = min(_VERIFY_BACKOFF[step], interval) if step < len(_VERIFY_BACKOFF) else interval
+            step += 1
+        remaining = end - time.monotonic()
+        if remaining <= 0:
+            break
+        time.sleep(min(delay, remaining))
     return False, last
 def _try_vendor_first(device_id, flow, enable, ini_path=None):
     """
@@ -1094,13 +1575,12 @@ def _try_vendor_first(device_id, flow, enable, ini_path=None):
     """
     # 1) INI vendors (MAIN only)
     db = _load_vendor_db_split(ini_path)
-    main_entries = db.get("main") or []
-    for entry in main_entries:
+    for entry in _vendor_entries_applying(db, device_id, flow):
         try:
             # Fail-fast: still require GUID membership for selecting candidates quickly,
             # but truth is signature. This prevents false "supported" when the value
             # doesn't exist for this endpoint.
-            if _vendor_entry_applies(entry, device_id, flow) and _main_entry_signature_applies(entry, device_id, flow):
+            if _main_entry_signature_applies(entry, device_id, flow):
                 wrote = _set_vendor_entry_state(entry, device_id, flow, enable)
                 if wrote:
                     ok, st = _verify_vendor_entry(entry, device_id, flow, enable, timeout=2.5, interval=0.2, consecutive=2)
@@ -1116,12 +1596,13 @@ def _find_first_vendor_entry(device_id, flow, ini_path=None):
     No GUID gating. No name gating. Registry decides.
     """
     db = _load_vendor_db_split(ini_path)
-    main_entries = db.get("main") or []
     flow_name = "Render" if str(flow).lower().startswith("r") else "Capture"
+    main_entries = db.get("main") or []
     for entry in main_entries:
         try:
             # flow filter (cheap)
-            if entry.get("flows") and flow_name not in entry["flows"]:
+            flows = entry.get("flows_set") or entry.get("flows")
+            if flows and flow_name not in flows:
                 continue
             if _main_entry_signature_applies(entry, device_id, flow_name):
                 return entry
@@ -1132,50 +1613,82 @@ def _entries_identical_main(a, b):
     return (a.get("value_name","").strip().lower() == b.get("value_name","").strip().lower()
             and int(a.get("enable", -999)) == int(b.get("enable", -999))
             and int(a.get("disable", -999)) == int(b.get("disable", -999)))
+def _main_identity_key(e):
+    """Grouping key equivalent to _entries_identical_main (None if payload isn't int)."""
+    try:
+        return (e.get("value_name","").strip().lower(),
+                int(e.get("enable", -999)), int(e.get("disable", -999)))
+    except Exception:
+        return None
+def _find_identical_main(db, candidate):
+    """First MAIN entry (INI order) identical to candidate, or None."""
+    idx = db.get("main_by_identity")
+    if idx is None:
+        return next((e for e in (db.get("main") or []) if _entries_identical_main(e, candidate)), None)
+    bucket = idx.get(_main_identity_key(candidate), ())
+    return bucket[0] if bucket else None
+def _find_identical_fx_single(db, candidate):
+    """First single-DWORD FX entry (INI order) identical to candidate, or None."""
+    idx = db.get("fx_by_identity")
+    if idx is None:
+        return next((e for e in (db.get("fx") or [])
+                     if not e.get("multi_write") and _entries_identical_fx(e, candidate)), None)
+    bucket = idx.get(_fx_identity_key(candidate, False), ())
+    return bucket[0] if bucket else None
+def _fx_identity_key(entry, multi=None):
+    """
+    Dedupe identity of an FX entry (fx_name ignored):
+      ("multi", sorted normalized writes, str(decider_index), quorum float or None)
+      ("single", value_name, enable text, disable text)
+    multi defaults to the entry's own multi_write flag. Stored at INI load as
+    identity_key so dedupe compares tuples instead of rebuilding them per pair.
+    """
+    if multi is None:
+        multi = bool(entry.get("multi_write"))
+    if multi:
+        try:
+            qt = float(entry.get("quorum_threshold", 0.60))
+        except Exception:
+            qt = None
+        return ("multi",
+                tuple(sorted(_norm_write_item(w) for w in (entry.get("writes") or []))),
+                str(entry.get("decider_index", 1)),
+                qt)
+    # Accept either enable/disable or dword_enable/dword_disable keys
+    if "enable" in entry or "disable" in entry:
+        en, di = str(entry.get("enable")).strip(), str(entry.get("disable")).strip()
+    else:
+        en, di = str(entry.get("dword_enable")).strip(), str(entry.get("dword_disable")).strip()
+    return ("single", sys.intern((entry.get("value_name") or "").strip().lower()), en, di)
+def _entry_fx_identity_key(entry, multi):
+    k = entry.get("identity_key")
+    if k is not None and (k[0] == "multi") == multi:
+        return k
+    return _fx_identity_key(entry, multi)
 def _entries_identical_fx(a, b):
     # For dedupe, ignore fx_name differences; rely on writes or value_name/dwords
     if a.get("multi_write") and b.get("multi_write"):
-        def _wkey(w):
-            return (
-                (w.get("hive") or "").upper(),
-                (w.get("subkey") or "").strip().lower(),  # normalize case here
-                (w.get("name") or "").strip().lower(),
-                (w.get("type_enable") or "").upper(),
-                (w.get("type_disable") or "").upper(),
-                str(w.get("enable") or ""),
-                str(w.get("disable") or "")
-            )
-        wa = sorted([_wkey(w) for w in (a.get("writes") or [])])
-        wb = sorted([_wkey(w) for w in (b.get("writes") or [])])
-        if wa != wb:
-            return False
-        if str(a.get("decider_index", 1)) != str(b.get("decider_index", 1)):
+        ka = _entry_fx_identity_key(a, True)
+        kb = _entry_fx_identity_key(b, True)
+        if ka[1:3] != kb[1:3]:
             return False
-        try:
-            qa = float(a.get("quorum_threshold", 0.60))
-            qb = float(b.get("quorum_threshold", 0.60))
-        except Exception:
+        if ka[3] is None or kb[3] is None:
             return False
-        return abs(qa - qb) < 1e-6
+        return abs(ka[3] - kb[3]) < 1e-6
     # Legacy/single-DWORD FX: compare value_name + enable/disable values
-    a_val = (a.get("value_name") or "").strip().lower()
-    b_val = (b.get("value_name") or "").strip().lower()
-    # Accept either enable/disable or dword_enable/dword_disable keys
-    def _ed_pair(entry):
-        if "enable" in entry or "disable" in entry:
-            return str(entry.get("enable")).strip(), str(entry.get("disable")).strip()
-        return str(entry.get("dword_enable")).strip(), str(entry.get("dword_disable")).strip()
-    ae, ad = _ed_pair(a)
-    be, bd = _ed_pair(b)
-    return (a_val == b_val) and (ae == be) and (ad == bd)
+    return _entry_fx_identity_key(a, False) == _entry_fx_identity_key(b, False)
 def _norm_write_item(w):
-    # Normalize a single write item for canonical identity
+    # Normalize a single write item for canonical identity.
+    # The location/type parts come from a small closed set (hives, types, subkeys,
+    # value names), so intern them: identity keys built from many entries then share
+    # the strings and tuple compares short-circuit on identity. Payloads are left
+    # alone: REG_BINARY hex text can run to kilobytes and is rarely shared.
     return (
-        (w.get("hive") or "").upper(),
-        (w.get("subkey") or "").strip().lower(),
-        (w.get("name") or "").strip().lower(),
-        (w.get("type_enable") or "").upper(),
-        (w.get("type_disable") or "").upper(),
+        sys.intern((w.get("hive") or "").upper()),
+        sys.intern((w.get("subkey") or "").strip().lower()),
+        sys.intern((w.get("name") or "").strip().lower()),
+        sys.intern((w.get("type_enable") or "").upper()),
+        sys.intern((w.get("type_disable") or "").upper()),
         str(w.get("enable") or ""),
         str(w.get("disable") or ""),
     )
@@ -1197,6 +1710,10 @@ def _fx_canonical_key_single(value_name, enable, disable):
     return ("fx-single",
             (str(value_name or "").strip().lower(),),
             int(enable), int(disable))
+# Section names are persisted in users' INIs, so the digest (sha1) must not change:
+# a different hash would stop learn from finding sections it created earlier.
+# Key tuples are hashable, so repeat names are memoized instead.
+@functools.lru_cache(maxsize=256)
 def _canonical_section_name_from_key(key_tuple):
     # Stable section name: fx_ + first 16 hex of sha1 over repr(key_tuple)
     h = hashlib.sha1(repr(key_tuple).encode("utf-8", "replace")).hexdigest()[:16]
@@ -1208,7 +1725,12 @@ def _write_applies_to_guid(w, guid_lc: str) -> bool:
       - None  => universal (applies to all)
       - []    => applies to nobody
       - list  => applies only to listed GUIDs
+    Frozen writes carry devices_set (only when devices is set), so the common case
+    is one lookup plus one hash probe.
     """
+    devs_set = w.get("devices_set")
+    if devs_set is not None:
+        return guid_lc in devs_set
     devs = w.get("devices", None)
     if devs is None:
         return True
@@ -1252,6 +1774,50 @@ def _fast_key_lastwrite(hive_name: str, base_path: str):
                 return None
     except OSError:
         return None
+def _fast_read_key_bulk(hive_name: str, base_path: str, value_names):
+    """
+    One OpenKey for a hive/base: read all requested values under it (what repeated
+    _fast_read_one calls do with one open each).
+    Returns {name: (value, type)} for values present; {} if the key cannot be opened.
+    """
+    if not base_path:
+        return {}
+    hive = winreg.HKEY_LOCAL_MACHINE if (hive_name or "").upper() == "HKLM" else winreg.HKEY_CURRENT_USER
+    values = {}
+    try:
+        with winreg.OpenKey(hive, base_path, 0, winreg.KEY_READ) as key:
+            for name in value_names:
+                if not name:
+                    continue
+                try:
+                    values[name] = winreg.QueryValueEx(key, name)
+                except OSError:
+                    pass
+    except OSError:
+        return {}
+    return values
+# Short-lived cache in front of _fast_read_key_bulk for GUI polling bursts.
+# Why: redraws can ask for the same endpoint keys many times within a frame, while
+# driver-side values change on the order of seconds. Our own writes clear it.
+_FAST_READ_TTL = 0.2
+_FAST_READ_CACHE_MAX = 512
+_FAST_READ_CACHE = {}
+def _fast_read_key_cached(hive_name: str, base_path: str, value_names):
+    """_fast_read_key_bulk with a _FAST_READ_TTL cache keyed by (hive, base, names)."""
+    ck = ((hive_name or "").upper(), base_path, tuple(value_names))
+    now = time.monotonic()
+    hit = _FAST_READ_CACHE.get(ck)
+    if hit is not None and (now - hit[0]) < _FAST_READ_TTL:
+        return hit[1]
+    values = _fast_read_key_bulk(hive_name, base_path, ck[2])
+    if len(_FAST_READ_CACHE) >= _FAST_READ_CACHE_MAX:
+        _FAST_READ_CACHE.clear()
+    _FAST_READ_CACHE[ck] = (now, values)
+    return values
+def _forget_fast_reads():
+    """Drop cached fast reads and applies decisions (call after writing endpoint values)."""
+    _FAST_READ_CACHE.clear()
+    _APPLIES_CACHE.clear()
 def _value_equals(expected, expected_type_name, actual_val, actual_typ):
     """
     Type-aware equality check for single-probe comparisons.
@@ -1271,12 +1837,46 @@ def _value_equals(expected, expected_type_name, actual_val, actual_typ):
             return False
     if tname == "REG_BINARY" and actual_typ == winreg.REG_BINARY:
         try:
-            exp_bytes = _parse_bin_hex(expected)
+            exp_bytes = expected if isinstance(expected, bytes) else _parse_bin_hex(expected)
             return bytes(actual_val) == exp_bytes
         except Exception:
             return False
     # Not comparable or wrong type
     return False
+def _fast_write_score(w):
+    """
+    Rank a multi-write as the fast-read indicator: prefer FxProperties, then
+    REG_DWORD (0/1), else others. Keeps GUI state reads fast while still picking
+    the most stable indicator.
+    """
+    s = 0
+    if str((w.get("subkey") or "")).strip().startswith("FxProperties"):
+        s += 10
+    t_en = (w.get("type_enable") or "").upper()
+    t_di = (w.get("type_disable") or "").upper()
+    if t_en == "REG_DWORD" and t_di == "REG_DWORD":
+        s += 5
+        try:
+            if {int(w.get("enable")), int(w.get("disable"))} == {0, 1}:
+                s += 2
+        except Exception:
+            pass
+    return s
+def _write_read_score(w):
+    """_fast_write_score, served from the load-time read_score when present."""
+    s = w.get("read_score")
+    return _fast_write_score(w) if s is None else s
+def _fast_probe_for_writes(writes):
+    """
+    (write, recorded hive, alternate hive, subkey, value name) probed by
+    _fast_read_vendor_entry_state: the first highest-scoring write.
+    """
+    w = max(writes, key=_write_read_score)
+    rec_hive = (w.get("hive") or "HKCU").upper()
+    alt_hive = "HKCU" if rec_hive == "HKLM" else "HKLM"
+    subkey = (w.get("subkey") or "FxProperties").strip()
+    val_name = (w.get("name") or "").strip().lower()
+    return (w, rec_hive, alt_hive, subkey, val_name)
 def _fast_read_vendor_entry_state(entry, device_id, flow):
     """
     FAST state read (True/False/None) driven by learned scope.
@@ -1293,52 +1893,32 @@ def _fast_read_vendor_entry_state(entry, device_id, flow):
             # For fast, universal reads, do not filter by write{i}_devices.
             # Instead, pick the best candidate from all writes and probe it. If the
             # key doesn't exist for this device, the read will fail gracefully.
-            writes = all_writes
-            # Score: prefer FxProperties, then REG_DWORD (0/1), else others
-            # This keeps GUI state reads fast while still picking the most stable indicator.
-            def _score(w):
-                s = 0
-                if str((w.get("subkey") or "")).strip().startswith("FxProperties"):
-                    s += 10
-                t_en = (w.get("type_enable") or "").upper()
-                t_di = (w.get("type_disable") or "").upper()
-                if t_en == "REG_DWORD" and t_di == "REG_DWORD":
-                    s += 5
-                    try:
-                        if {int(w.get("enable")), int(w.get("disable"))} == {0, 1}:
-                            s += 2
-                    except Exception:
-                        pass
-                return s
-            w = sorted(writes, key=_score, reverse=True)[0]
-            rec_hive = (w.get("hive") or "HKCU").upper()
-            alt_hive = "HKCU" if rec_hive == "HKLM" else "HKLM"
-            subkey = (w.get("subkey") or "FxProperties").strip()
-            val_name = (w.get("name") or "").strip().lower()
+            # The probe (best write + hives/subkey/name) is chosen once at INI load.
+            probe = entry.get("fast_probe") or _fast_probe_for_writes(all_writes)
+            w, rec_hive, alt_hive, subkey, val_name = probe
             base = _endpoint_base_path(device_id, flow, subkey)
             if not base:
                 return None
-            states, times = {}, {}
+            states = {}
             for hn in (rec_hive, alt_hive):
-                val, typ = _fast_read_one(hn, base, val_name)
+                # Last-write times are only needed for the disagreement tie-break below
+                vals = _fast_read_key_cached(hn, base, (val_name,))
+                val, typ = vals.get(val_name, (None, None))
                 if val is None:
                     states[hn] = None
-                    times[hn] = _fast_key_lastwrite(hn, base)
                     continue
                 try:
                     _ = _reg_name_to_type(w.get("type_enable"))
                     _ = _reg_name_to_type(w.get("type_disable"))
                 except Exception:
                     states[hn] = None
-                    times[hn] = _fast_key_lastwrite(hn, base)
                     continue
-                if _value_equals(w.get("enable"), w.get("type_enable"), val, typ):
+                if _value_equals(_write_payload(w, True), w.get("type_enable"), val, typ):
                     states[hn] = True
-                elif _value_equals(w.get("disable"), w.get("type_disable"), val, typ):
+                elif _value_equals(_write_payload(w, False), w.get("type_disable"), val, typ):
                     states[hn] = False
                 else:
                     states[hn] = None
-                times[hn] = _fast_key_lastwrite(hn, base)
             s_rec, s_alt = states.get(rec_hive), states.get(alt_hive)
             if s_rec is not None and s_alt is None:
                 return s_rec
@@ -1349,7 +1929,7 @@ def _fast_read_vendor_entry_state(entry, device_id, flow):
                     return s_rec
                 # Tie-break when both hives are readable but disagree:
                 # prefer whichever key was written more recently.
-                t_rec = times.get(rec_hive); t_alt = times.get(alt_hive)
+                t_rec = _fast_key_lastwrite(rec_hive, base); t_alt = _fast_key_lastwrite(alt_hive, base)
                 try:
                     if isinstance(t_rec, int) and isinstance(t_alt, int):
                         if t_alt > t_rec: return s_alt
@@ -1384,13 +1964,13 @@ def _fast_read_vendor_entry_state(entry, device_id, flow):
             allowed = {"HKCU", "HKLM"}
         # Read both (subject to allowed)
         state = {}      # hive -> True/False/None
-        lastw = {}      # hive -> int or None
         for hname in ("HKCU", "HKLM"):
             if hname not in allowed:
                 state[hname] = None
-                lastw[hname] = None
                 continue
-            val, typ = _fast_read_one(hname, base, val_name)
+            # Last-write times are only needed for the disagreement tie-break below
+            vals = _fast_read_key_cached(hname, base, (val_name,))
+            val, typ = vals.get(val_name, (None, None))
             if val is None or typ != winreg.REG_DWORD:
                 state[hname] = None
             else:
@@ -1404,7 +1984,6 @@ def _fast_read_vendor_entry_state(entry, device_id, flow):
                         state[hname] = None
                 except Exception:
                     state[hname] = None
-            lastw[hname] = _fast_key_lastwrite(hname, base)
         cu = state.get("HKCU")
         lm = state.get("HKLM")
         if cu is not None and lm is None:
@@ -1416,8 +1995,8 @@ def _fast_read_vendor_entry_state(entry, device_id, flow):
         if cu is not None and lm is not None and cu != lm:
             # Tie-break when both hives are readable but disagree:
             # choose the most recently written key.
-            tcu = lastw.get("HKCU")
-            tlm = lastw.get("HKLM")
+            tcu = _fast_key_lastwrite("HKCU", base)
+            tlm = _fast_key_lastwrite("HKLM", base)
             try:
                 if isinstance(tcu, int) and isinstance(tlm, int):
                     if tlm > tcu:
@@ -1441,36 +2020,106 @@ def _fast_get_enhancements_state(device_id, flow):
     if not e:
         return None
     return _fast_read_vendor_entry_state(e, device_id, flow)
-def _append_guid_to_section(ini_path, section_name, guid_lc):
+# INI line patterns for the devices editors (compiled once; write{i}_devices per index)
+_DEVICES_LINE_RE = re.compile(r"^\s*devices\s*=\s*(.*)$", re.IGNORECASE)
+# write_count = N, and any write{i}_<field> = value line (index, field, value)
+_WRITE_COUNT_RE = re.compile(r"^\s*write_count\s*=\s*(\d+)\s*$", re.IGNORECASE)
+_WRITE_LINE_RE = re.compile(
+    r"^\s*write(\d+)_(hive|subkey|name|type_enable|type_disable|enable|disable|devices)\s*=\s*(.*)$",
+    re.IGNORECASE)
+_WRITE_DEVICES_PAT_CACHE = {}
+def _write_devices_pat(write_index):
+    """Compiled ^write{i}_devices = (value) pattern for write_index."""
+    pat = _WRITE_DEVICES_PAT_CACHE.get(write_index)
+    if pat is None:
+        pat = re.compile(rf"^\s*write{write_index}_devices\s*=\s*(.*)$", re.IGNORECASE)
+        _WRITE_DEVICES_PAT_CACHE[write_index] = pat
+    return pat
+class _IniEditor:
+    """
+    Batch line edits to one INI: read once on enter, write once on exit (only if an
+    edit changed something). The guid/devices helpers below accept editor=... so a
+    caller chaining several edits (e.g. _cleanup_conflicting_toggles) rewrites the
+    file once instead of once per edit.
+    Section headers are indexed once per line count, so each edit in a batch finds
+    its section with a dict lookup instead of re-stripping every line. Edits only
+    replace non-header lines or insert lines, so the index stays valid until the
+    line count changes.
+    """
+    def __init__(self, ini_path):
+        self.ini_path = ini_path
+        self.lines = []
+        self.exists = False
+        self.dirty = False
+        self._hdr_len = -1
+        self._hdr_rows = []   # header line indexes, in order
+        self._hdr_first = {}  # lowercased "[name]" -> position in _hdr_rows (first one wins)
+    def __enter__(self):
+        try:
+            with open(self.ini_path, "r", encoding="utf-8", errors="replace") as f:
+                self.lines = f.read().splitlines(keepends=True)
+            self.exists = True
+        except FileNotFoundError:
+            self.lines = []
+        # Terminate an unterminated last line up front: otherwise each edit that appends
+        # after it splices in its own "\n" line, and a later edit in the same batch
+        # that rewrites that last line leaves the spliced "\n" behind as a blank line.
+        if self.lines and not self.lines[-1].endswith(("\n", "\r")):
+            self.lines[-1] += "\n"
+        return self
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None and self.dirty:
+            _write_ini_lines(self.ini_path, self.lines)
+            _forget_vendor_db(self.ini_path)
+        return False
+    def _index_headers(self):
+        lines = self.lines
+        if self._hdr_len == len(lines):
+            return
+        rows, first = [], {}
+        for i, line in enumerate(lines):
+            stripped = line.strip()
+            if stripped.startswith("[") and stripped.endswith("]"):
+                first.setdefault(stripped.lower(), len(rows))
+                rows.append(i)
+        self._hdr_rows, self._hdr_first, self._hdr_len = rows, first, len(lines)
+    def insert_lines(self, at, new_lines):
+        """
+        Splice new_lines in before index 'at' in one list operation, first ending
+        an unterminated previous line (the file's last line) so text doesn't merge.
+        """
+        new_lines = list(new_lines)
+        if not new_lines:
+            return
+        if at > 0 and not self.lines[at - 1].endswith(("\n", "\r")):
+            new_lines.insert(0, "\n")
+        self.lines[at:at] = new_lines
+        self.dirty = True
+    def section_bounds(self, section_name):
+        """(header index, end index) of [section_name] (case-insensitive), or None."""
+        self._index_headers()
+        pos = self._hdr_first.get(f"[{section_name}]".lower())
+        if pos is None:
+            return None
+        rows = self._hdr_rows
+        # first header after our section -> marks end
+        end = rows[pos + 1] if pos + 1 < len(rows) else len(self.lines)
+        return rows[pos], end
+def _append_guid_to_section(ini_path, section_name, guid_lc, editor=None):
     """
     Append guid_lc to the 'devices' line of [section_name] in-place.
     - Preserves comments and ordering.
     - If devices line is missing, insert one at the end of the section.
     - If the section doesn't exist, append a new section with just devices.
+    editor: an open _IniEditor to batch into (else the file is edited on its own).
     """
-    try:
-        with open(ini_path, "r", encoding="utf-8", errors="replace") as f:
-            lines = f.read().splitlines(keepends=True)
-    except FileNotFoundError:
-        lines = []
+    if editor is None:
+        with _IniEditor(ini_path) as ed:
+            return _append_guid_to_section(ini_path, section_name, guid_lc, editor=ed)
+    lines = editor.lines
     sec_hdr = f"[{section_name}]"
-    sec_start = None
-    sec_end = len(lines)
-    # Locate section
-    for i, line in enumerate(lines):
-        stripped = line.strip()
-        if stripped.startswith("[") and stripped.endswith("]"):
-            if sec_start is None:
-                if stripped.lower() == sec_hdr.lower():
-                    sec_start = i
-            else:
-                # first header after our section -> marks end
-                sec_end = i
-                break
-        elif sec_start is not None and sec_end == len(lines):
-            # keep scanning until we see next section header
-            continue
-    if sec_start is None:
+    bounds = editor.section_bounds(section_name)
+    if bounds is None:
         # Section doesn't exist: append new section at end
         new = []
         if lines and not lines[-1].endswith(("\n", "\r")):
@@ -1478,61 +2127,54 @@ def _append_guid_to_section(ini_path, section_name, guid_lc):
         new.append(f"{sec_hdr}\n")
         new.append(f"devices = {guid_lc}\n")
         lines.extend(new)
-    else:
-        # Section exists: find devices= line
-        devices_idx = None
-        guid_set = None
-        for i in range(sec_start + 1, sec_end):
-            m = re.match(r"^\s*devices\s*=\s*(.*)$", lines[i], flags=re.IGNORECASE)
-            if m:
-                devices_idx = i
-                # Parse CSV list into set (lowercased, trimmed)
-                existing = [x.strip().lower() for x in m.group(1).split(",") if x.strip()]
-                guid_set = set(existing)
-                break
-        if guid_set is None:
-            guid_set = set()
-        if guid_lc not in guid_set:
-            guid_set.add(guid_lc)
-            new_value = ",".join(sorted(guid_set))
-            new_line = f"devices = {new_value}\n"
-            if devices_idx is not None:
-                lines[devices_idx] = new_line
-            else:
-                # Insert before sec_end (end of section)
-                insert_at = sec_end
-                # If there’s no trailing newline before next header, ensure one
-                if insert_at > 0 and not lines[insert_at - 1].endswith(("\n", "\r")):
-                    lines.insert(insert_at, "\n")
-                    insert_at += 1
-                lines.insert(insert_at, new_line)
-    with open(ini_path, "w", encoding="utf-8", errors="replace") as f:
-        f.writelines(lines)
-def _append_guid_to_write_devices(ini_path, section_name, write_index, guid_lc):
+        editor.dirty = True
+        return
+    sec_start, sec_end = bounds
+    # Section exists: find devices= line
+    devices_idx = None
+    guid_set = None
+    for i in range(sec_start + 1, sec_end):
+        m = _DEVICES_LINE_RE.match(lines[i])
+        if m:
+            devices_idx = i
+            # Parse CSV list into set (lowercased, trimmed)
+            existing = [x.strip().lower() for x in m.group(1).split(",") if x.strip()]
+            guid_set = set(existing)
+            break
+    if guid_set is None:
+        guid_set = set()
+    if guid_lc not in guid_set:
+        guid_set.add(guid_lc)
+        new_value = ",".join(sorted(guid_set))
+        new_line = f"devices = {new_value}\n"
+        if devices_idx is not None:
+            lines[devices_idx] = new_line
+        else:
+            # Insert before sec_end (end of section)
+            insert_at = sec_end
+            # If there’s no trailing newline before next header, ensure one
+            if insert_at > 0 and not lines[insert_at - 1].endswith(("\n", "\r")):
+                lines.insert(insert_at, "\n")
+                insert_at += 1
+            lines.insert(insert_at, new_line)
+        editor.dirty = True
+def _append_guid_to_write_devices(ini_path, section_name, write_index, guid_lc, editor=None):
     """
     Ensure write{write_index}_devices contains guid_lc.
     If missing, create it. If empty, add guid_lc. Keeps list unique and sorted.
+    editor: an open _IniEditor to batch into (else the file is edited on its own).
     """
-    try:
-        with open(ini_path, "r", encoding="utf-8", errors="replace") as f:
-            lines = f.read().splitlines(keepends=True)
-    except FileNotFoundError:
+    if editor is None:
+        with _IniEditor(ini_path) as ed:
+            return _append_guid_to_write_devices(ini_path, section_name, write_index, guid_lc, editor=ed)
+    if not editor.exists:
         return
-    sec_hdr = f"[{section_name}]"
-    sec_start = None
-    sec_end = len(lines)
-    for i, line in enumerate(lines):
-        s = line.strip()
-        if s.startswith("[") and s.endswith("]"):
-            if sec_start is None:
-                if s.lower() == sec_hdr.lower():
-                    sec_start = i
-            else:
-                sec_end = i
-                break
-    if sec_start is None:
+    lines = editor.lines
+    bounds = editor.section_bounds(section_name)
+    if bounds is None:
         return
-    key_pat = re.compile(rf"^\s*write{write_index}_devices\s*=\s*(.*)$", re.IGNORECASE)
+    sec_start, sec_end = bounds
+    key_pat = _write_devices_pat(write_index)
     devices_idx = None
     existing = None  # None means no line present
     for i in range(sec_start + 1, sec_end):
@@ -1552,40 +2194,32 @@ def _append_guid_to_write_devices(ini_path, section_name, write_index, guid_lc):
         if insert_at > 0 and not lines[insert_at - 1].endswith(("\n", "\r")):
             lines.insert(insert_at, "\n"); insert_at += 1
         lines.insert(insert_at, new_line)
+        editor.dirty = True
     else:
         if guid_lc.lower() not in existing:
             existing.append(guid_lc.lower())
             new_line = f"write{write_index}_devices = {','.join(sorted(set(existing)))}\n"
             if devices_idx is not None:
                 lines[devices_idx] = new_line
-    with open(ini_path, "w", encoding="utf-8", errors="replace") as f:
-        f.writelines(lines)
-def _remove_guid_from_write_devices(ini_path, section_name, write_index, guid_lc):
+                editor.dirty = True
+def _remove_guid_from_write_devices(ini_path, section_name, write_index, guid_lc, editor=None):
     """
     Remove guid_lc from write{write_index}_devices.
     If the devices line becomes empty, keep it as an empty list (applies to nobody).
     (We do NOT delete the line; empty means 'no devices', not 'universal'.)
+    editor: an open _IniEditor to batch into (else the file is edited on its own).
     """
-    try:
-        with open(ini_path, "r", encoding="utf-8", errors="replace") as f:
-            lines = f.read().splitlines(keepends=True)
-    except FileNotFoundError:
+    if editor is None:
+        with _IniEditor(ini_path) as ed:
+            return _remove_guid_from_write_devices(ini_path, section_name, write_index, guid_lc, editor=ed)
+    if not editor.exists:
         return
-    sec_hdr = f"[{section_name}]"
-    sec_start = None
-    sec_end = len(lines)
-    for i, line in enumerate(lines):
-        s = line.strip()
-        if s.startswith("[") and s.endswith("]"):
-            if sec_start is None:
-                if s.lower() == sec_hdr.lower():
-                    sec_start = i
-            else:
-                sec_end = i
-                break
-    if sec_start is None:
+    lines = editor.lines
+    bounds = editor.section_bounds(section_name)
+    if bounds is None:
         return
-    key_pat = re.compile(rf"^\s*write{write_index}_devices\s*=\s*(.*)$", re.IGNORECASE)
+    sec_start, sec_end = bounds
+    key_pat = _write_devices_pat(write_index)
     for i in range(sec_start + 1, sec_end):
         m = key_pat.match(lines[i])
         if not m:
@@ -1595,16 +2229,35 @@ def _remove_guid_from_write_devices(ini_path, section_name, write_index, guid_lc
         cur = [x for x in cur if x != guid_lc.lower()]
         # Keep the line; empty means 'applies to nobody'
         new_line = f"write{write_index}_devices = {','.join(cur)}\n" if cur else f"write{write_index}_devices = \n"
-        lines[i] = new_line
+        if lines[i] != new_line:
+            lines[i] = new_line
+            editor.dirty = True
         break
-    with open(ini_path, "w", encoding="utf-8", errors="replace") as f:
-        f.writelines(lines)
+def _write_payload_key(w):
+    """
+    Normalized (hive, subkey, name, type_enable, type_disable, enable, disable) of a
+    write: two writes match by full identity+payload iff their keys are equal, and
+    the first three fields alone are the write's registry location.
+    Frozen INI writes carry it precomputed as payload_key.
+    """
+    key = w.get("payload_key")
+    if key is not None:
+        return key
+    return (
+        w.get("hive","").upper(),
+        str(w.get("subkey","")).strip().lower(),
+        str(w.get("name","")).strip().lower(),
+        str(w.get("type_enable","")).upper(),
+        str(w.get("type_disable","")).upper(),
+        str(w.get("enable","")).strip(),
+        str(w.get("disable","")).strip(),
+    )
 def _find_write_index_by_payload(ini_path, section_name, w):
     """
     Find write{i} index in section by full identity+payload match.
     Returns i or None.
     """
-    db = _load_vendor_db_split(ini_path)
+    db = _load_vendor_db_split(ini_path, force=True)
     target = None
     for e in (db.get("fx") or []):
         if e.get("name") == section_name:
@@ -1612,21 +2265,12 @@ def _find_write_index_by_payload(ini_path, section_name, w):
             break
     if not target:
         return None
-    def _same(a, b):
-        return (
-            (a.get("hive","").upper() == b.get("hive","").upper()) and
-            (str(a.get("subkey","")).strip().lower() == str(b.get("subkey","")).strip().lower()) and
-            (str(a.get("name","")).strip().lower() == str(b.get("name","")).strip().lower()) and
-            (str(a.get("type_enable","")).upper() == str(b.get("type_enable","")).upper()) and
-            (str(a.get("type_disable","")).upper() == str(b.get("type_disable","")).upper()) and
-            (str(a.get("enable","")).strip() == str(b.get("enable","")).strip()) and
-            (str(a.get("disable","")).strip() == str(b.get("disable","")).strip())
-        )
+    key = _write_payload_key(w)
     for idx, cw in enumerate(target.get("writes") or [], start=1):
-        if _same(cw, w):
+        if _write_payload_key(cw) == key:
             return idx
     return None
-def _cleanup_conflicting_toggles(ini_path, section_name, guid_lc, keep_idx, keep_write):
+def _cleanup_conflicting_toggles(ini_path, section_name, guid_lc, keep_idx, keep_write, editor=None):
     """
     Ensure guid_lc is NOT listed on any other toggle in this bucket that has
     the same identity (hive/subkey/name) but different payload than keep_write.
@@ -1634,8 +2278,22 @@ def _cleanup_conflicting_toggles(ini_path, section_name, guid_lc, keep_idx, keep
     Why:
       A bucket can hold multiple devices. If two write blocks have the same identity
       but different payload, attaching a GUID to both would make toggling ambiguous.
+    editor: an open _IniEditor to batch into (else the file is edited on its own).
+    Conflicts are found from the INI as last written to disk.
     """
-    db = _load_vendor_db_split(ini_path)
+    _cleanup_conflicting_toggles_batch(ini_path, section_name, guid_lc, [(keep_idx, keep_write)], editor=editor)
+def _cleanup_conflicting_toggles_batch(ini_path, section_name, guid_lc, kept, editor=None):
+    """
+    _cleanup_conflicting_toggles for several (keep_idx, keep_write) pairs of one
+    bucket and GUID: the bucket is loaded and its writes grouped by location once,
+    so each kept write only visits the blocks sharing its location.
+    """
+    if editor is None:
+        with _IniEditor(ini_path) as ed:
+            return _cleanup_conflicting_toggles_batch(ini_path, section_name, guid_lc, kept, editor=ed)
+    if not kept:
+        return
+    db = _load_vendor_db_split(ini_path, force=True)
     target = None
     for e in (db.get("fx") or []):
         if e.get("name") == section_name:
@@ -1643,21 +2301,19 @@ def _cleanup_conflicting_toggles(ini_path, section_name, guid_lc, keep_idx, keep
             break
     if not target:
         return
-    def _same_identity(a, b):
-        return (
-            (a.get("hive","").upper() == b.get("hive","").upper()) and
-            (str(a.get("subkey","")).strip().lower() == str(b.get("subkey","")).strip().lower()) and
-            (str(a.get("name","")).strip().lower() == str(b.get("name","")).strip().lower())
-        )
+    by_loc = {}
     for idx, cw in enumerate(target.get("writes") or [], start=1):
-        if idx == keep_idx:
-            continue
-        if _same_identity(cw, keep_write):
-            # remove guid from this conflicting toggle
-            _remove_guid_from_write_devices(ini_path, section_name, idx, guid_lc)
+        by_loc.setdefault(_write_payload_key(cw)[:3], []).append(idx)
+    for keep_idx, keep_write in kept:
+        for idx in by_loc.get(_write_payload_key(keep_write)[:3], ()):
+            if idx != keep_idx:
+                # remove guid from this conflicting toggle
+                _remove_guid_from_write_devices(ini_path, section_name, idx, guid_lc, editor=editor)
+# Characters kept in generated vendor_<value name> section names
+_SECTION_UNSAFE_RE = re.compile(r'[^A-Za-z0-9_,\-{}]+')
 def _sanitize_ini_section_name(value_name: str):
     # e.g. "{1da5d803-...},5" -> "vendor_{1da5d803-...},5"
-    base = re.sub(r'[^A-Za-z0-9_,\-{}]+', "_", value_name)
+    base = _SECTION_UNSAFE_RE.sub("_", value_name)
     return f"vendor_{base}"
 def _append_vendor_ini_entry_if_missing(ini_path, section_name, value_name, dword_enable, dword_disable,
                                         flows="Render,Capture", hives="HKCU,HKLM", notes="", subkey="FxProperties"):
@@ -1665,13 +2321,9 @@ def _append_vendor_ini_entry_if_missing(ini_path, section_name, value_name, dwor
     Append a vendor INI section to ini_path only if it does not already exist.
     Records 'subkey' so fast reads/writes hit the exact learned spot.
     """
-    cfg = configparser.ConfigParser()
-    try:
-        if os.path.exists(ini_path):
-            cfg.read(ini_path, encoding="utf-8")
-    except Exception:
-        pass
-    if cfg.has_section(section_name):
+    # Existence check against the cached parse (all section names, valid or not)
+    # instead of a full ConfigParser tokenization of the file.
+    if section_name in _load_vendor_db_split(ini_path, force=True).get("sections", ()):
         return "exists"
     try:
         ini_dir = os.path.dirname(ini_path)
@@ -1695,6 +2347,7 @@ def _append_vendor_ini_entry_if_missing(ini_path, section_name, value_name, dwor
     text = "\n".join(lines) + "\n"
     with open(ini_path, "a", encoding="utf-8", errors="replace") as f:
         f.write(text)
+    _forget_vendor_db(ini_path)
     return "appended"
 def _build_vendor_ini_snippet(target, snapA, snapB, diffs, section_name=None):
     """
@@ -1724,7 +2377,7 @@ def _build_vendor_ini_snippet(target, snapA, snapB, diffs, section_name=None):
     dword_disable = int(pick["after"])
     picked_subkey = pick.get("subkey") if pick.get("subkey") in ("FxProperties", "Properties") else "FxProperties"
     if not section_name:
-        base = re.sub(r'[^A-Za-z0-9_,\-{}]+', "_", pick["name"])
+        base = _SECTION_UNSAFE_RE.sub("_", pick["name"])
         section_name = f"vendor_{base}"
     notes = f"Auto-learned (manual UI) on '{target.get('name')}' ({target.get('flow')}). A=enabled,B=disabled."
     snippet = []
@@ -1745,16 +2398,32 @@ def _collect_registry_samples(device_id, repeats=3, delay=0.15):
     Why:
       Registry dumps are noisy during UI operations; sampling lets us keep only stable keys
       for FX learning (reduces false positives).
-    """
-    samples = []
-    for i in range(max(1, int(repeats))):
+    Samples start `delay` apart but their dumps overlap on a small thread pool, so the
+    wall time is about one dump plus the settles instead of repeats full dumps.
+    AUDIOCTL_SERIAL_SAMPLE=1 restores one-after-another sampling.
+    """
+    n = max(1, int(repeats))
+    def _sample(i):
+        # Keep the original spacing between sample start times (noise filtering
+        # depends on samples being taken at different moments).
+        if i:
+            _short_settle(delay * i)
         try:
-            samples.append(_dump_mmdevices_all_values(device_id))
+            return _dump_mmdevices_all_values(device_id)
         except Exception:
-            samples.append([])
-        if i + 1 < repeats:
-            _short_settle(delay)
-    return samples
+            return []
+    if n == 1 or os.environ.get("AUDIOCTL_SERIAL_SAMPLE", "0") == "1":
+        samples = []
+        for i in range(n):
+            try:
+                samples.append(_dump_mmdevices_all_values(device_id))
+            except Exception:
+                samples.append([])
+            if i + 1 < n:
+                _short_settle(delay)
+        return samples
+    with ThreadPoolExecutor(max_workers=n) as pool:
+        return list(pool.map(_sample, range(n)))
 def _stable_registry_map(samples):
     """
     From a list of registry dumps (lists of rec dicts), build a stability map:
@@ -1766,26 +2435,52 @@ def _stable_registry_map(samples):
     """
     if not samples:
         return {}
-    counts = {}
+    if len(samples) == 1:
+        # Single dump: every key is stable unless it appears more than once
+        # (a repeat counts past the one sample, exactly as the general path does).
+        out, dup = {}, set()
+        for rec in (samples[0] or []):
+            k = (str(rec.get("hive")), str(rec.get("flow")), str(rec.get("subkey")), str(rec.get("name")).lower())
+            if k in out:
+                dup.add(k)
+            out[k] = {"type": rec.get("type"), "value": rec.get("dataRaw")}
+        for k in dup:
+            del out[k]
+        return out
+    counts = {}  # key -> [type, value, seen, ok]
     total = len(samples)
     for lst in samples:
         for rec in (lst or []):
             k = (str(rec.get("hive")), str(rec.get("flow")), str(rec.get("subkey")), str(rec.get("name")).lower())
-            typ = rec.get("type")
-            val = rec.get("dataRaw")
-            if k not in counts:
-                counts[k] = {"ok": True, "type": typ, "value": val, "seen": 1}
-            else:
-                same = (counts[k]["type"] == typ) and (counts[k]["value"] == val)
-                if same:
-                    counts[k]["seen"] += 1
+            info = counts.get(k)
+            if info is None:
+                counts[k] = [rec.get("type"), rec.get("dataRaw"), 1, True]
+            elif info[3]:
+                # Keys that already changed stay dropped; skip comparing their payloads
+                if info[0] == rec.get("type") and info[1] == rec.get("dataRaw"):
+                    info[2] += 1
                 else:
-                    counts[k]["ok"] = False
+                    info[3] = False
     out = {}
-    for k, info in counts.items():
-        if info["ok"] and info["seen"] == total:
-            out[k] = {"type": info["type"], "value": info["value"]}
+    for k, (typ, val, seen, ok) in counts.items():
+        if ok and seen == total:
+            out[k] = {"type": typ, "value": val}
     return out
+def _stable_diff(stableA, stableB):
+    """
+    Keys whose stable type matches in both maps but whose value differs, in key order:
+    [(key, type, valueA, valueB), ...]. Walks the smaller map and probes the larger
+    one, so only the changed keys are ever sorted.
+    """
+    small, large = (stableA, stableB) if len(stableA) <= len(stableB) else (stableB, stableA)
+    changed = []
+    for k, rs in small.items():
+        rl = large.get(k)
+        if rl is None or rs["type"] != rl["type"] or rs["value"] == rl["value"]:
+            continue
+        changed.append(k)
+    changed.sort()
+    return [(k, stableA[k]["type"], stableA[k]["value"], stableB[k]["value"]) for k in changed]
 def _build_fx_multiwrite_from_stable_maps(target, stableA, stableB):
     """
     Build multi-write entries from stability-filtered maps:
@@ -1797,25 +2492,13 @@ def _build_fx_multiwrite_from_stable_maps(target, stableA, stableB):
       FxProperties + DWORD 0/1 flips are treated as stronger signals than REG_BINARY changes.
     """
     writes = []
-    both = set(stableA.keys()) & set(stableB.keys())
-    for k in sorted(both):
-        ta = stableA[k]["type"]; tb = stableB[k]["type"]
-        va = stableA[k]["value"]; vb = stableB[k]["value"]
-        if ta != tb or va == vb:
+    for k, ta, va, vb in _stable_diff(stableA, stableB):
+        enc = _ENCODERS.get(ta)
+        if enc is None:
             continue
         hive, flow, subkey, name = k
-        def _encode(typ, raw):
-            if typ == winreg.REG_DWORD:
-                try: return int(raw)
-                except Exception: return None
-            if typ == winreg.REG_SZ:
-                try: return str(raw)
-                except Exception: return None
-            if typ == winreg.REG_BINARY:
-                return _format_bin_hex(str(raw or ""))
-            return None
-        en = _encode(ta, va)
-        di = _encode(tb, vb)
+        en = enc(va)
+        di = enc(vb)
         if en is None or di is None:
             continue
         writes.append({
@@ -1823,31 +2506,31 @@ def _build_fx_multiwrite_from_stable_maps(target, stableA, stableB):
             "subkey": subkey,
             "name": name,
             "type_enable": _reg_type_to_name(ta),
-            "type_disable": _reg_type_to_name(tb),
+            "type_disable": _reg_type_to_name(ta),
             "enable": en,
             "disable": di,
         })
     # Prefer stable indicators first => decider_index=1 picks the best
-    def _score(w):
-        score = 0
-        if str(w.get("subkey") or "").startswith("FxProperties"):
-            score += 3
-        te = (w["type_enable"] or "").upper()
-        td = (w["type_disable"] or "").upper()
-        if te == "REG_DWORD" and td == "REG_DWORD":
-            score += 3
-            try:
-                if {int(w["enable"]), int(w["disable"])} == {0, 1}:
-                    score += 2
-            except Exception:
-                pass
-        if te == "REG_BINARY" and td == "REG_BINARY":
-            score -= 1
-        return score
-    writes.sort(key=_score, reverse=True)
+    writes.sort(key=_learned_write_score, reverse=True)
     return writes
+def _learned_write_score(w):
+    """Decider ranking for learned writes: FxProperties and DWORD 0/1 flips first, BINARY last."""
+    score = 0
+    if str(w.get("subkey") or "").startswith("FxProperties"):
+        score += 3
+    te = (w["type_enable"] or "").upper()
+    td = (w["type_disable"] or "").upper()
+    if te == "REG_DWORD" and td == "REG_DWORD":
+        score += 3
+        try:
+            if {int(w["enable"]), int(w["disable"])} == {0, 1}:
+                score += 2
+        except Exception:
+            pass
+    if te == "REG_BINARY" and td == "REG_BINARY":
+        score -= 1
+    return score
 def _learn_vendor_from_discovery_and_write_ini(target, ini_path=None, prefer_hkcu=True):
-    import sys
     dev_id = target["id"]
     flow   = target["flow"]
     name   = target["name"]
@@ -1868,13 +2551,14 @@ I UNDERSTAND
     print(f"Manual learn target: {name} ({flow})")
     print("Step 1: In Windows Sound settings, set 'Audio Enhancements' to ENABLED for this device.")
     input("When ready, press Enter to capture snapshot A... ")
-    snapA = _collect_sysfx_snapshot(dev_id)
+    # Only the registry dump feeds the diff; don't keep the COM/PropertyStore views alive.
+    regA = _collect_sysfx_snapshot(dev_id).get("registry") or []
     print("Step 2: Now set 'Audio Enhancements' to DISABLED for the same device.")
     input("When ready, press Enter to capture snapshot B... ")
-    snapB = _collect_sysfx_snapshot(dev_id)
+    regB = _collect_sysfx_snapshot(dev_id).get("registry") or []
     
-    diffs = _diff_mmdevices_lists(snapA.get("registry") or [], snapB.get("registry") or [])
-    snippet, picked = _build_vendor_ini_snippet(target, snapA, snapB, diffs)
+    diffs = _diff_mmdevices_lists(regA, regB)
+    snippet, picked = _build_vendor_ini_snippet(target, {"registry": regA}, {"registry": regB}, diffs)
     if not picked: return False, "No suitable REG_DWORD flip found."
     
     value_name    = picked["name"]
@@ -1882,26 +2566,23 @@ I UNDERSTAND
     dword_disable = int(picked["after"])
     guid_lc = _guid_of(dev_id)
     
-    db = _load_vendor_db_split(ini_path)
+    db = _load_vendor_db_split(ini_path, force=True)
     candidate = {"type": "main", "value_name": value_name.strip().lower(), "enable": dword_enable, "disable": dword_disable}
-    for e in (db.get("main") or []):
-        if _entries_identical_main(e, candidate):
-            # Zero-Touch
-            return True, {"iniPath": ini_path, "section": e.get("name"), "value_name": value_name, "dword_enable": dword_enable, "dword_disable": dword_disable, "note": "Primed existing universal rule (no INI changes)."}
+    e = _find_identical_main(db, candidate)
+    if e is not None:
+        # Zero-Touch
+        return True, {"iniPath": ini_path, "section": e.get("name"), "value_name": value_name, "dword_enable": dword_enable, "dword_disable": dword_disable, "note": "Primed existing universal rule (no INI changes)."}
             
     section_name  = _sanitize_ini_section_name(value_name)
     notes = f"Auto-learned (manual UI) on '{name}' ({flow}). A=enabled,B=disabled."
     hives = "HKCU,HKLM" if prefer_hkcu else "HKLM,HKCU"
     try:
         res = _append_vendor_ini_entry_if_missing(ini_path, section_name, value_name, dword_enable, dword_disable, flows="Render,Capture", hives=hives, notes=notes, subkey=(picked.get("subkey") if picked else "FxProperties"))
-        _append_guid_to_section(ini_path, section_name, guid_lc)
-        try: _append_guid_to_name_bucket(ini_path, section_name, name, guid_lc)
-        except Exception: pass
+        _add_guid_to_section_and_name_bucket(ini_path, section_name, name, guid_lc)
     except PermissionError as e: return False, f"Permission denied writing INI: {e}"
     except OSError as e: return False, f"Failed to write INI: {e}"
     return True, {"iniPath": ini_path, "section": section_name, "value_name": value_name, "dword_enable": dword_enable, "dword_disable": dword_disable}
 def _learn_vendor_and_write_ini(target, ini_path=None):
-    import sys
     dev_id = target["id"]
     flow   = target["flow"]
     name   = target["name"]
@@ -1926,17 +2607,18 @@ Type exactly: I UNDERSTAND
     try: _set_enhancements_registry(dev_id, True, prefer_hklm=is_admin())
     except Exception: pass
     _short_settle(0.3)
-    snapA = _collect_sysfx_snapshot(dev_id)
+    # Only the registry dump feeds the diff; don't keep the COM/PropertyStore views alive.
+    regA = _collect_sysfx_snapshot(dev_id).get("registry") or []
     
     try: _set_enhancements_propstore(dev_id, False)
     except Exception: pass
     try: _set_enhancements_registry(dev_id, False, prefer_hklm=is_admin())
     except Exception: pass
     _short_settle(0.3)
-    snapB = _collect_sysfx_snapshot(dev_id)
+    regB = _collect_sysfx_snapshot(dev_id).get("registry") or []
     
-    diffs = _diff_mmdevices_lists(snapA.get("registry") or [], snapB.get("registry") or [])
-    snippet, picked = _build_vendor_ini_snippet(target, snapA, snapB, diffs)
+    diffs = _diff_mmdevices_lists(regA, regB)
+    snippet, picked = _build_vendor_ini_snippet(target, {"registry": regA}, {"registry": regB}, diffs)
     if not picked: return False, "No suitable REG_DWORD flip found."
         
     value_name = picked["name"]
@@ -1944,23 +2626,21 @@ Type exactly: I UNDERSTAND
     dword_disable = int(picked["after"])
     guid_lc = _guid_of(dev_id)
     
-    db = _load_vendor_db_split(ini_path)
+    db = _load_vendor_db_split(ini_path, force=True)
     candidate = {"type": "main", "value_name": value_name.strip().lower(), "enable": dword_enable, "disable": dword_disable}
-    for e in (db.get("main") or []):
-        if _entries_identical_main(e, candidate):
-            try:
-                if orig is True or orig is False: _apply_enhancements(dev_id, flow, orig, prefer_hklm=is_admin(), allow_universal_scan=False, vendor_ini_path=ini_path)
-            except Exception: pass
-            # Zero-Touch
-            return True, {"iniPath": ini_path, "section": e.get("name"), "value_name": value_name, "dword_enable": dword_enable, "dword_disable": dword_disable, "note": "Primed existing universal rule (no INI changes)."}
+    e = _find_identical_main(db, candidate)
+    if e is not None:
+        try:
+            if orig is True or orig is False: _apply_enhancements(dev_id, flow, orig, prefer_hklm=is_admin(), allow_universal_scan=False, vendor_ini_path=ini_path)
+        except Exception: pass
+        # Zero-Touch
+        return True, {"iniPath": ini_path, "section": e.get("name"), "value_name": value_name, "dword_enable": dword_enable, "dword_disable": dword_disable, "note": "Primed existing universal rule (no INI changes)."}
             
     section_name  = _sanitize_ini_section_name(value_name)
     notes = f"Auto-learned on '{name}' ({flow}). A=enabled,B=disabled."
     try:
         res = _append_vendor_ini_entry_if_missing(ini_path, section_name, value_name, dword_enable, dword_disable, flows="Render,Capture", hives="HKCU,HKLM", notes=notes)
-        _append_guid_to_section(ini_path, section_name, guid_lc)
-        try: _append_guid_to_name_bucket(ini_path, section_name, name, guid_lc)
-        except Exception: pass
+        _add_guid_to_section_and_name_bucket(ini_path, section_name, name, guid_lc)
     except PermissionError as e: return False, f"Permission denied writing INI: {e}"
     except OSError as e: return False, f"Failed to write INI: {e}"
         
@@ -1984,6 +2664,7 @@ def _get_enhancements_status_any(device_id, flow):
     except Exception:
         pass
     return None
+@functools.lru_cache(maxsize=1024)
 def _endpoint_base_path(device_id, flow, subkey):
     guid = _extract_endpoint_guid_from_device_id(device_id)
     if not guid:
@@ -2000,17 +2681,7 @@ def _perform_multi_writes(entry, device_id, flow, enable):
     ok_all = True
     guid_lc = _guid_of(device_id)
     writes_all = entry.get("writes") or []
-    
-    profiles = {}
-    for w in writes_all:
-        devs = w.get("devices")
-        if devs is not None and len(devs) > 0:
-            for g in devs:
-                if g not in profiles: profiles[g] = []
-                profiles[g].append(w)
-    uni_writes = [w for w in writes_all if w.get("devices") is None]
-    for g in profiles:
-        profiles[g].extend(uni_writes)
+    profiles = _entry_write_profiles(entry)
 
     writes_to_apply = writes_all # Default fallback
     if guid_lc in profiles:
@@ -2030,10 +2701,10 @@ def _perform_multi_writes(entry, device_id, flow, enable):
                 lm_val, lm_typ = _fast_read_one("HKLM", base, name)
                 if cu_typ is not None or lm_typ is not None:
                     tot += 1
-                    if _value_equals(w.get("enable"), w.get("type_enable"), cu_val, cu_typ) or \
-                       _value_equals(w.get("enable"), w.get("type_enable"), lm_val, lm_typ) or \
-                       _value_equals(w.get("disable"), w.get("type_disable"), cu_val, cu_typ) or \
-                       _value_equals(w.get("disable"), w.get("type_disable"), lm_val, lm_typ):
+                    if _value_equals(_write_payload(w, True), w.get("type_enable"), cu_val, cu_typ) or \
+                       _value_equals(_write_payload(w, True), w.get("type_enable"), lm_val, lm_typ) or \
+                       _value_equals(_write_payload(w, False), w.get("type_disable"), cu_val, cu_typ) or \
+                       _value_equals(_write_payload(w, False), w.get("type_disable"), lm_val, lm_typ):
                         score += 1
             if tot > 0:
                 ratio = score / float(tot)
@@ -2043,6 +2714,8 @@ def _perform_multi_writes(entry, device_id, flow, enable):
         if best_writes is not None:
             writes_to_apply = best_writes
 
+    # Group by (hive, base) so each key is opened once for every write under it.
+    groups = {}
     for w in writes_to_apply:
         subk = (w.get("subkey") or "").strip()
         name = (w.get("name") or "").strip().lower()
@@ -2051,41 +2724,47 @@ def _perform_multi_writes(entry, device_id, flow, enable):
             ok_all = False
             continue
             
-        hive_name = (w.get("hive") or "").upper()
-        hive = winreg.HKEY_LOCAL_MACHINE if hive_name == "HKLM" else winreg.HKEY_CURRENT_USER
-        tname = w.get("type_enable") if enable else w.get("type_disable")
-        try:
-            typ = _reg_name_to_type(tname)
-        except Exception:
-            ok_all = False
-            continue
-        val_text = w.get("enable") if enable else w.get("disable")
-        try:
-            if typ == winreg.REG_DWORD: data = int(val_text)
-            elif typ == winreg.REG_SZ: data = str(val_text)
-            elif typ == winreg.REG_BINARY: data = _parse_bin_hex(val_text)
-            else:
+        hive = w.get("hive_handle")
+        if hive is None:
+            hive = _hive_handle(w.get("hive"))
+        typ = w.get("type_enable_code") if enable else w.get("type_disable_code")
+        if typ is None:
+            tname = w.get("type_enable") if enable else w.get("type_disable")
+            try:
+                typ = _reg_name_to_type(tname)
+            except Exception:
                 ok_all = False
                 continue
-        except Exception:
-            ok_all = False
-            continue
+        # Prefer the payload decoded at INI load; decode the text only for entries
+        # built elsewhere (or whose payload failed to decode, which fails again here).
+        data = w.get("enable_data") if enable else w.get("disable_data")
+        if data is None:
+            val_text = w.get("enable") if enable else w.get("disable")
+            try:
+                data = _decode_reg_payload(typ, val_text)
+            except Exception:
+                data = None
+            if data is None:
+                ok_all = False
+                continue
+        groups.setdefault((hive, base), []).append((name, typ, data))
             
+    for (hive, base), items in groups.items():
         try:
             # Registry Truth: Only open and modify existing keys. Never invent them.
             with winreg.OpenKey(hive, base, 0, winreg.KEY_SET_VALUE) as key:
-                if typ == winreg.REG_BINARY: 
-                    winreg.SetValueEx(key, name, 0, winreg.REG_BINARY, data)
-                else: 
-                    winreg.SetValueEx(key, name, 0, typ, data)
+                for name, typ, data in items:
+                    try:
+                        winreg.SetValueEx(key, name, 0, typ, data)
+                    except OSError:
+                        ok_all = False
         except OSError:
-            # If the key does not exist or permission is denied, the write fails.
+            # If the key does not exist or permission is denied, every write under it fails.
             ok_all = False
-            continue
-            
+    _forget_fast_reads()
     return ok_all
     
-def _read_decider_state(entry, device_id, flow):
+def _read_decider_state(entry, device_id, flow, values_cache=None):
     # Multi-write readback:
     # - First attempt quorum decision (fraction of applicable writes that agree).
     # - If quorum can't be reached, fall back to reading a "best" signal write (FxProperties, DWORD 0/1 preferred).
@@ -2109,63 +2788,80 @@ def _read_decider_state(entry, device_id, flow):
             if exp_typ == winreg.REG_SZ:
                 return str(cur_val) == str(exp_text)
             if exp_typ == winreg.REG_BINARY:
+                if isinstance(exp_text, bytes):
+                    return bytes(cur_val) == exp_text
                 return bytes(cur_val) == _parse_bin_hex(exp_text)
         except Exception:
             return False
         return False
+    # Without a caller-owned values_cache, read each (hive, subkey) once for every
+    # write name under it instead of one OpenKey per write and hive.
+    names_by_subkey = {}
+    for w in writes:
+        names_by_subkey.setdefault((w.get("subkey") or "").strip(), set()).add(
+            (w.get("name") or "").strip().lower())
+    key_values = {}
     def _try_read_one(w, hive_name):
         hive = winreg.HKEY_LOCAL_MACHINE if hive_name == "HKLM" else winreg.HKEY_CURRENT_USER
         subk = (w.get("subkey") or "").strip()
         name = (w.get("name") or "").strip().lower()
-        base = _endpoint_base_path(device_id, flow, subk)
-        if not base:
-            return None
-        try:
-            with winreg.OpenKey(hive, base, 0, winreg.KEY_READ) as key:
-                val, typ = winreg.QueryValueEx(key, name)
-        except OSError:
-            return None
-        try:
-            t_en = _reg_name_to_type(w.get("type_enable"))
-            t_di = _reg_name_to_type(w.get("type_disable"))
-        except Exception:
+        if values_cache is None and name:
+            ck = (hive, subk)
+            vals = key_values.get(ck)
+            if vals is None:
+                base = _endpoint_base_path(device_id, flow, subk)
+                vals = _fast_read_key_bulk("HKLM" if hive_name == "HKLM" else "HKCU", base,
+                                           sorted(names_by_subkey[subk]))
+                key_values[ck] = vals
+            got = vals.get(name)
+        else:
+            got = _read_endpoint_value(device_id, flow, subk, hive, name, values_cache)
+        if got is None:
             return None
-        if _eq_expected(val, typ, w.get("enable"), t_en):
+        val, typ = got
+        t_en = w.get("type_enable_code")
+        t_di = w.get("type_disable_code")
+        if t_en is None or t_di is None:
+            try:
+                t_en = _reg_name_to_type(w.get("type_enable"))
+                t_di = _reg_name_to_type(w.get("type_disable"))
+            except Exception:
+                return None
+        if _eq_expected(val, typ, _write_payload(w, True), t_en):
             return True
-        if _eq_expected(val, typ, w.get("disable"), t_di):
+        if _eq_expected(val, typ, _write_payload(w, False), t_di):
             return False
         return None
+    # Best indicators first: they're the likeliest to vote, so the early exit fires sooner.
+    ranked = sorted(writes, key=_write_read_score, reverse=True)
     votes_true = votes_false = votes_total = 0
-    for w in writes:
+    remaining = len(ranked)
+    for w in ranked:
         rec_hive = (w.get("hive") or "").upper()
         alt_hive = "HKCU" if rec_hive == "HKLM" else "HKLM"
         s = _try_read_one(w, rec_hive)
         if s is None:
             s = _try_read_one(w, alt_hive)
+        remaining -= 1
         if s is True:
             votes_true += 1; votes_total += 1
         elif s is False:
             votes_false += 1; votes_total += 1
+        else:
+            continue
+        # Stop once the outcome can't change: even if every unread write voted the
+        # other way, the quorum result below would be the same.
+        worst_total = votes_total + remaining
+        if votes_true / worst_total >= quorum_threshold and (votes_false + remaining) / worst_total < quorum_threshold:
+            return True
+        if votes_false / worst_total >= quorum_threshold and (votes_true + remaining) / worst_total < quorum_threshold:
+            return False
     if votes_total > 0:
         if votes_true / votes_total >= quorum_threshold and votes_false / votes_total < quorum_threshold:
             return True
         if votes_false / votes_total >= quorum_threshold and votes_true / votes_total < quorum_threshold:
             return False
-    def _score(w):
-        s = 0
-        if str((w.get("subkey") or "").strip()).startswith("FxProperties"):
-            s += 10
-        t_en = (w.get("type_enable") or "").upper()
-        t_di = (w.get("type_disable") or "").upper()
-        if t_en == "REG_DWORD" and t_di == "REG_DWORD":
-            s += 5
-            try:
-                if {int(w["enable"]), int(w["disable"])} == {0, 1}:
-                    s += 2
-            except Exception:
-                pass
-        return s
-    for w in sorted(writes, key=_score, reverse=True):
+    for w in ranked:
         rec_hive = (w.get("hive") or "").upper()
         alt_hive = "HKCU" if rec_hive == "HKLM" else "HKLM"
         s = _try_read_one(w, rec_hive)
@@ -2178,57 +2874,41 @@ def _read_decider_state(entry, device_id, flow):
 def _dump_mmdevices_all_values_for_fx_learn(device_id):
     # Deprecated in favor of _dump_mmdevices_all_values from devices.py
     return _dump_mmdevices_all_values(device_id)
-def _find_fx_bucket_section_name(ini_path, fx_name):
-    cfg = configparser.ConfigParser()
-    try:
-        if os.path.exists(ini_path):
-            cfg.read(ini_path, encoding="utf-8")
-    except Exception:
-        return None
-    target = (fx_name or "").strip().lower()
-    for sec in cfg.sections():
-        try:
-            if cfg.get(sec, "type", fallback="").strip().lower() != "fx":
-                continue
-            if cfg.get(sec, "fx_name", fallback="").strip().lower() == target:
-                return sec
-        except Exception:
-            continue
-    return None
+def _find_fx_bucket_section_name(ini_path, fx_name, db=None):
+    # Served from the cached DB's fx_buckets index (same file scan as every load);
+    # pass db when the caller already holds a fresh load of ini_path.
+    if db is None:
+        db = _load_vendor_db_split(ini_path, force=True)
+    return db.get("fx_buckets", {}).get((fx_name or "").strip().lower())
+# Bucket names are persisted in users' INI files, so the SHA-1 naming stays; fx names
+# repeat across devices and learns, so memoize instead.
+@functools.lru_cache(maxsize=256)
 def _canonical_fx_bucket_name(fx_name):
-    import hashlib
     key = (fx_name or "").strip().lower()
     h = hashlib.sha1(key.encode("utf-8", "replace")).hexdigest()[:16]
     return f"fx_{h}"
-def _append_new_write_to_section(ini_path, section_name, write_dict, guid_lc):
+def _append_new_write_to_section(ini_path, section_name, write_dict, guid_lc, editor=None):
     """
     Append a new write{i}_* block (with write{i}_devices = {guid}) and bump write_count.
     write_dict keys: hive, subkey, name, type_enable, type_disable, enable, disable
-    """
-    try:
-        with open(ini_path, "r", encoding="utf-8", errors="replace") as f:
-            lines = f.read().splitlines(keepends=True)
-    except FileNotFoundError:
-        return
-    sec_hdr = f"[{section_name}]"
-    sec_start = None
-    sec_end = len(lines)
-    for i, line in enumerate(lines):
-        s = line.strip()
-        if s.startswith("[") and s.endswith("]"):
-            if sec_start is None:
-                if s.lower() == sec_hdr.lower():
-                    sec_start = i
-            else:
-                sec_end = i
-                break
-    if sec_start is None:
-        return
+    editor: an open _IniEditor to batch into (else the file is edited on its own).
+    Returns the new write index, or None if the INI/section doesn't exist.
+    """
+    if editor is None:
+        with _IniEditor(ini_path) as ed:
+            return _append_new_write_to_section(ini_path, section_name, write_dict, guid_lc, editor=ed)
+    ed = editor
+    if not ed.exists:
+        return None
+    bounds = ed.section_bounds(section_name)
+    if bounds is None:
+        return None
+    sec_start, sec_end = bounds
+    lines = ed.lines
     wc_idx = None
     write_count = 0
-    wc_pat = re.compile(r"^\s*write_count\s*=\s*(\d+)\s*$", re.IGNORECASE)
     for i in range(sec_start + 1, sec_end):
-        m = wc_pat.match(lines[i])
+        m = _WRITE_COUNT_RE.match(lines[i])
         if m:
             wc_idx = i
             try:
@@ -2237,9 +2917,6 @@ def _append_new_write_to_section(ini_path, section_name, write_dict, guid_lc):
                 write_count = 0
             break
     new_idx = write_count + 1 if write_count > 0 else 1
-    insert_at = sec_end
-    if insert_at > 0 and not lines[insert_at - 1].endswith(("\n", "\r")):
-        lines.insert(insert_at, "\n"); insert_at += 1
     w = write_dict
     block = [
         f"write{new_idx}_hive = {w.get('hive')}\n",
@@ -2251,14 +2928,13 @@ def _append_new_write_to_section(ini_path, section_name, write_dict, guid_lc):
         f"write{new_idx}_disable = {w.get('disable')}\n",
         f"write{new_idx}_devices = {guid_lc}\n",
     ]
-    for line in block:
-        lines.insert(insert_at, line); insert_at += 1
+    # Block at the section end first so the write_count index below stays valid
+    ed.insert_lines(sec_end, block)
     if wc_idx is not None:
         lines[wc_idx] = f"write_count = {new_idx}\n"
     else:
-        lines.insert(sec_start + 1, f"write_count = {new_idx}\n")
-    with open(ini_path, "w", encoding="utf-8", errors="replace") as f:
-        f.writelines(lines)
+        ed.insert_lines(sec_start + 1, [f"write_count = {new_idx}\n"])
+    return new_idx
 def _delete_fx_for_guid(fx_name, device_id, ini_path=None):
     """
     Remove associations for 'fx_name' for the specific device GUID from vendor_toggles.ini:
@@ -2273,6 +2949,8 @@ def _delete_fx_for_guid(fx_name, device_id, ini_path=None):
       If a write block was universal (no write{i}_devices line), delete converts it
       into an explicit scoped list of remaining devices so the removed GUID is excluded.
       Empty write{i}_devices lines are preserved intentionally (they mean "applies to nobody").
+    Edits are made against the lines as read: replacements in place, new lines queued
+    per position and spliced in once at the end (one read, one write of the INI).
     """
     ini_path = ini_path or _vendor_ini_default_path()
     guid_lc = _guid_of(device_id)
@@ -2282,130 +2960,97 @@ def _delete_fx_for_guid(fx_name, device_id, ini_path=None):
     if not section:
         return False, "fx-bucket-not-found"
     try:
-        with open(ini_path, "r", encoding="utf-8", errors="replace") as f:
-            lines = f.read().splitlines(keepends=True)
-    except FileNotFoundError:
-        return False, "ini-not-found"
-    sec_hdr = f"[{section}]"
-    sec_start = None
-    sec_end = len(lines)
-    for i, line in enumerate(lines):
-        s = line.strip()
-        if s.startswith("[") and s.endswith("]"):
-            if sec_start is None:
-                if s.lower() == sec_hdr.lower():
-                    sec_start = i
-            else:
-                sec_end = i
-                break
-    if sec_start is None:
+        with _IniEditor(ini_path) as ed:
+            if not ed.exists:
+                return False, "ini-not-found"
+            result = _delete_fx_guid_lines(ed, section, guid_lc)
+    except OSError as e:
+        return False, f"write-ini-failed: {e}"
+    return result
+def _delete_fx_guid_lines(ed, section, guid_lc):
+    lines = ed.lines
+    bounds = ed.section_bounds(section)
+    if bounds is None:
         return False, "bucket-section-missing"
-    # Section devices (union)
+    sec_start, sec_end = bounds
+    pending = {}  # insert position (original index) -> lines, in queue order
+    # One pass over the section: devices (union), write_count and, per write index,
+    # the first hive / devices / disable line (first match wins, as before).
     devices_idx = None
     cur_devices = []
-    dev_pat = re.compile(r"^\s*devices\s*=\s*(.*)$", re.IGNORECASE)
-    for i in range(sec_start + 1, sec_end):
-        m = dev_pat.match(lines[i])
-        if m:
-            devices_idx = i
-            txt = (m.group(1) or "").strip()
-            cur_devices = [x.strip().lower() for x in txt.split(",") if x.strip()]
-            break
-    # write_count
     wc_idx = None
     write_count = 0
-    wc_pat = re.compile(r"^\s*write_count\s*=\s*(\d+)\s*$", re.IGNORECASE)
-    for i in range(sec_start + 1, sec_end):
-        m = wc_pat.match(lines[i])
+    by_idx = {}  # i -> {"hive": j, "devices": (j, [guids]), "disable": j}
+    for j in range(sec_start + 1, sec_end):
+        line = lines[j] or ""
+        m = _WRITE_LINE_RE.match(line)
         if m:
-            wc_idx = i
-            try:
-                write_count = int(m.group(1))
-            except Exception:
-                write_count = 0
-            break
-    # Helpers for per-write devices
-    def _get_write_devices(i_idx):
-        pat = re.compile(rf"^\s*write{i_idx}_devices\s*=\s*(.*)$", re.IGNORECASE)
-        for j in range(sec_start + 1, sec_end):
-            m = pat.match(lines[j] or "")
+            rec = by_idx.setdefault(int(m.group(1)), {})
+            field = m.group(2).lower()
+            if field == "devices":
+                if "devices" not in rec:
+                    txt = (m.group(3) or "").strip()
+                    rec["devices"] = (j, [x.strip().lower() for x in txt.split(",") if x.strip()] if txt else [])
+            elif field in ("hive", "disable"):
+                rec.setdefault(field, j)
+            continue
+        if devices_idx is None:
+            m = _DEVICES_LINE_RE.match(line)
             if m:
+                devices_idx = j
                 txt = (m.group(1) or "").strip()
-                devs = [x.strip().lower() for x in txt.split(",") if x.strip()] if txt else []
-                return j, devs
-        return None, None
-    def _set_write_devices(i_idx, dev_list):
-        pat = re.compile(rf"^\s*write{i_idx}_devices\s*=", re.IGNORECASE)
-        if dev_list is None:
-            line_txt = f"write{i_idx}_devices = \n"  # explicit none
-        else:
-            line_txt = f"write{i_idx}_devices = {','.join(sorted(set(d.lower() for d in dev_list)))}\n" if dev_list else f"write{i_idx}_devices = \n"
-        # Try to replace if exists
-        for j in range(sec_start + 1, sec_end):
-            if pat.match(lines[j] or ""):
-                lines[j] = line_txt
-                return
-        # Else insert after write{i}_disable or at sec_end
-        after_pat = re.compile(rf"^\s*write{i_idx}_disable\s*=", re.IGNORECASE)
-        insert_at = sec_end
-        for j in range(sec_start + 1, sec_end):
-            if after_pat.match(lines[j] or ""):
-                insert_at = j + 1
-                break
-        if insert_at > 0 and not lines[insert_at - 1].endswith(("\n", "\r")):
-            lines.insert(insert_at, "\n"); insert_at += 1
-        lines.insert(insert_at, line_txt)
+                cur_devices = [x.strip().lower() for x in txt.split(",") if x.strip()]
+                continue
+        if wc_idx is None:
+            m = _WRITE_COUNT_RE.match(line)
+            if m:
+                wc_idx = j
+                try:
+                    write_count = int(m.group(1))
+                except Exception:
+                    write_count = 0
+    def _devices_line(i_idx, dev_list):
+        if dev_list:
+            return f"write{i_idx}_devices = {','.join(sorted(set(d.lower() for d in dev_list)))}\n"
+        return f"write{i_idx}_devices = \n"  # explicit none
     writes_changed = 0
     # Remaining devices in bucket (minus target)
     remaining_bucket_devs = [d for d in cur_devices if d != guid_lc]
-    # Scan writes (up to declared count or a generous cap)
+    # Writes that exist (have a hive line), up to declared count or a generous cap
     max_scan = write_count if write_count > 0 else 256
-    for i_idx in range(1, max_scan + 1):
-        # Does write{i} exist?
-        hv_pat = re.compile(rf"^\s*write{i_idx}_hive\s*=", re.IGNORECASE)
-        exists = any(hv_pat.match(lines[j] or "") for j in range(sec_start + 1, sec_end))
-        if not exists:
-            if write_count > 0 and i_idx > write_count:
-                break
-            continue
-        w_idx, w_devs = _get_write_devices(i_idx)
-        if w_idx is not None:
-            if guid_lc in (w_devs or []):
-                new_list = [x for x in (w_devs or []) if x != guid_lc]
-                _set_write_devices(i_idx, new_list)
+    for i_idx in sorted(i for i, rec in by_idx.items() if "hive" in rec and 1 <= i <= max_scan):
+        rec = by_idx[i_idx]
+        if "devices" in rec:
+            j, w_devs = rec["devices"]
+            if guid_lc in w_devs:
+                lines[j] = _devices_line(i_idx, [x for x in w_devs if x != guid_lc])
+                ed.dirty = True
                 writes_changed += 1
         else:
-            # Universal write: scope to remaining devices (exclude target) or to none
-            if remaining_bucket_devs:
-                _set_write_devices(i_idx, remaining_bucket_devs)
-                writes_changed += 1
-            else:
-                _set_write_devices(i_idx, [])  # applies to nobody
-                writes_changed += 1
+            # Universal write: scope to remaining devices (exclude target) or to none,
+            # inserted after write{i}_disable or at the section end
+            at = rec["disable"] + 1 if "disable" in rec else sec_end
+            pending.setdefault(at, []).append(_devices_line(i_idx, remaining_bucket_devs))
+            writes_changed += 1
     # Update section devices (union)
     new_devices = [d for d in cur_devices if d != guid_lc]
     new_line = f"devices = {','.join(sorted(set(new_devices)))}\n" if new_devices else "devices = \n"
     if devices_idx is not None:
         lines[devices_idx] = new_line
+        ed.dirty = True
     else:
-        insert_at = sec_end
-        if insert_at > 0 and not lines[insert_at - 1].endswith(("\n", "\r")):
-            lines.insert(insert_at, "\n"); insert_at += 1
-        lines.insert(insert_at, new_line)
-    try:
-        with open(ini_path, "w", encoding="utf-8", errors="replace") as f:
-            f.writelines(lines)
-    except Exception as e:
-        return False, f"write-ini-failed: {e}"
+        pending.setdefault(sec_end, []).append(new_line)
+    # Splice queued lines bottom-up so earlier positions stay valid
+    for at in sorted(pending, reverse=True):
+        ed.insert_lines(at, pending[at])
     return True, {
-        "iniPath": ini_path,
+        "iniPath": ed.ini_path,
         "section": section,
         "removedGuid": guid_lc,
         "writesAffected": writes_changed,
         "remainingDevices": new_devices,
     }
 def _learn_fx_and_write_ini(target, fx_name, snapA, snapB, ini_path=None, prefer_hkcu=True, snapA2=None, snapB2=None):
-    import re
     ini_path = ini_path or _vendor_ini_default_path()
     guid_lc = _guid_of(target["id"])
     useA = snapA2 if isinstance(snapA2, dict) else snapA
@@ -2422,10 +3067,12 @@ def _learn_fx_and_write_ini(target, fx_name, snapA, snapB, ini_path=None, prefer
         return False, f"Failed to process snapshot B: {e}"
         
     writes = _build_fx_multiwrite_from_stable_maps(target, stableA, stableB)
-    safe_device_name = re.sub(r'[^A-Za-z0-9_\- ]+', '_', target["name"])
     notes = f"Learned FX '{fx_name}' for '{target['name']}' ({target['flow']}); second A/B pass; stability-filtered"
+    # One fresh load serves both the bucket merge and the single-DWORD lookup below;
+    # nothing touches the INI before either use, and every writer drops the cache slot.
+    db = _load_vendor_db_split(ini_path, force=True)
     if writes:
-        bucket = _find_fx_bucket_section_name(ini_path, fx_name)
+        bucket = _find_fx_bucket_section_name(ini_path, fx_name, db=db)
         if bucket is None:
             for w in writes:
                 w.setdefault("devices", None)
@@ -2438,12 +3085,9 @@ def _learn_fx_and_write_ini(target, fx_name, snapA, snapB, ini_path=None, prefer
                     "enable": w.get("enable"), "disable": w.get("disable"), "devices": [guid_lc],
                 })
             _append_fx_ini_entry_multi(ini_path, section_name, fx_name, target["name"], seed, notes=notes)
-            _append_guid_to_section(ini_path, section_name, guid_lc)
-            try: _append_guid_to_name_bucket(ini_path, section_name, target["name"], guid_lc)
-            except Exception: pass
+            _add_guid_to_section_and_name_bucket(ini_path, section_name, target["name"], guid_lc)
             return True, {"iniPath": ini_path, "section": section_name, "fx_name": fx_name, "multi_write": True, "write_count": len(seed)}
             
-        db = _load_vendor_db_split(ini_path)
         current = None
         for e in (db.get("fx") or []):
             if e.get("name") == bucket:
@@ -2451,36 +3095,31 @@ def _learn_fx_and_write_ini(target, fx_name, snapA, snapB, ini_path=None, prefer
                 break
         if current is None: return False, f"Bucket '{bucket}' not found."
         
-        def _same_identity_payload(a, b):
-            return ((a.get("hive","").upper() == b.get("hive","").upper()) and
-                (str(a.get("subkey","")).strip().lower() == str(b.get("subkey","")).strip().lower()) and
-                (str(a.get("name","")).strip().lower() == str(b.get("name","")).strip().lower()) and
-                (str(a.get("type_enable","")).upper() == str(b.get("type_enable","")).upper()) and
-                (str(a.get("type_disable","")).upper() == str(b.get("type_disable","")).upper()) and
-                (str(a.get("enable","")).strip() == str(b.get("enable","")).strip()) and
-                (str(a.get("disable","")).strip() == str(b.get("disable","")).strip()))
+        # Bucket writes by identity+payload (first index wins), built once for all learned writes
+        existing_index = {}
+        for idx, cw in enumerate(current.get("writes") or [], start=1):
+            existing_index.setdefault(_write_payload_key(cw), idx)
                 
+        # One INI rewrite however many writes are new. Conflict cleanup reads the bucket
+        # as it is on disk (still pre-append); that's enough because learned writes of
+        # one endpoint have distinct locations, so a cleanup never targets a block
+        # appended in this pass. It runs once for all appended writes.
         added_new_writes = False
-        for lw in writes:
-            idx_match = None
-            for idx, cw in enumerate(current.get("writes") or [], start=1):
-                if _same_identity_payload(lw, cw):
-                    idx_match = idx
-                    break
-            if idx_match is not None:
-                pass # Zero-Touch: Already matches perfectly, let universal spoofing handle it
-            else:
-                new_w = {"hive": lw.get("hive"), "subkey": lw.get("subkey"), "name": lw.get("name"), "type_enable": lw.get("type_enable"), "type_disable": lw.get("type_disable"), "enable": lw.get("enable"), "disable": lw.get("disable")}
-                _append_new_write_to_section(ini_path, bucket, new_w, guid_lc)
-                added_new_writes = True
-                new_idx = _find_write_index_by_payload(ini_path, bucket, new_w)
-                if new_idx is not None:
-                    _cleanup_conflicting_toggles(ini_path, bucket, guid_lc, new_idx, new_w)
-                    
-        if added_new_writes:
-            _append_guid_to_section(ini_path, bucket, guid_lc)
-            try: _append_guid_to_name_bucket(ini_path, bucket, target["name"], guid_lc)
-            except Exception: pass
+        kept = []
+        with _IniEditor(ini_path) as ed:
+            for lw in writes:
+                idx_match = existing_index.get(_write_payload_key(lw))
+                if idx_match is not None:
+                    pass # Zero-Touch: Already matches perfectly, let universal spoofing handle it
+                else:
+                    new_w = {"hive": lw.get("hive"), "subkey": lw.get("subkey"), "name": lw.get("name"), "type_enable": lw.get("type_enable"), "type_disable": lw.get("type_disable"), "enable": lw.get("enable"), "disable": lw.get("disable")}
+                    new_idx = _append_new_write_to_section(ini_path, bucket, new_w, guid_lc, editor=ed)
+                    added_new_writes = True
+                    if new_idx is not None:
+                        kept.append((new_idx, new_w))
+            _cleanup_conflicting_toggles_batch(ini_path, bucket, guid_lc, kept, editor=ed)
+            if added_new_writes:
+                _add_guid_to_section_and_name_bucket(ini_path, bucket, target["name"], guid_lc, editor=ed)
             
         return True, {"iniPath": ini_path, "section": bucket, "fx_name": fx_name, "multi_write": True, "write_count": None}
 
@@ -2496,92 +3135,119 @@ def _learn_fx_and_write_ini(target, fx_name, snapA, snapB, ini_path=None, prefer
     notes2 = notes + " (single DWORD)"
     hives = "HKCU,HKLM" if prefer_hkcu else "HKLM,HKCU"
     
-    db = _load_vendor_db_split(ini_path)
     candidate = {"type": "fx", "multi_write": False, "value_name": value_name.strip().lower(), "enable": dword_enable, "disable": dword_disable}
-    for e in (db.get("fx") or []):
-        if not e.get("multi_write") and _entries_identical_fx(e, candidate):
-            # Zero-Touch
-            return True, {"iniPath": ini_path, "section": e.get("name"), "fx_name": fx_name, "value_name": value_name, "dword_enable": dword_enable, "dword_disable": dword_disable, "note": "Primed existing universal rule (no INI changes)."}
+    e = _find_identical_fx_single(db, candidate)
+    if e is not None:
+        # Zero-Touch
+        return True, {"iniPath": ini_path, "section": e.get("name"), "fx_name": fx_name, "value_name": value_name, "dword_enable": dword_enable, "dword_disable": dword_disable, "note": "Primed existing universal rule (no INI changes)."}
             
     try:
         canon_key = _fx_canonical_key_single(value_name, dword_enable, dword_disable)
         section_name = _canonical_section_name_from_key(canon_key)
         _append_fx_ini_entry(ini_path, section_name, fx_name, target["name"], value_name, dword_enable, dword_disable, flows="Render,Capture", hives=hives, notes=notes2)
-        _append_guid_to_section(ini_path, section_name, guid_lc)
-        try: _append_guid_to_name_bucket(ini_path, section_name, target["name"], guid_lc)
-        except Exception: pass
+        _add_guid_to_section_and_name_bucket(ini_path, section_name, target["name"], guid_lc)
     except ValueError as e:
         msg = str(e or "").lower()
         if "already exists" in msg:
             try:
-                _append_guid_to_section(ini_path, section_name, guid_lc)
-                try: _append_guid_to_name_bucket(ini_path, section_name, target["name"], guid_lc)
-                except Exception: pass
+                _add_guid_to_section_and_name_bucket(ini_path, section_name, target["name"], guid_lc)
                 return True, {"iniPath": ini_path, "section": section_name, "fx_name": fx_name, "value_name": value_name, "dword_enable": dword_enable, "dword_disable": dword_disable}
             except Exception as e2: return False, f"Failed to append device to existing section '{section_name}': {e2}"
         return False, str(e)
     except Exception as e: return False, f"Failed to write INI: {e}"
     return True, {"iniPath": ini_path, "section": section_name, "fx_name": fx_name, "value_name": value_name, "dword_enable": dword_enable, "dword_disable": dword_disable}
 
-def _list_fx_for_device(device_id, flow, ini_path=None, device_name=None):
+def _list_fx_for_device(device_id, flow, ini_path=None, device_name=None, values_cache=None):
     """
     List all available FX for a device.
     Matching (read-only; does NOT modify INI):
       1) Direct GUID membership in section 'devices' (fast)
       2) If device_name provided: pattern match + registry signature match ("spoof")
     Returns [{'fx_name','entry'}]
+    values_cache: optional per-batch dict (see _read_endpoint_value) shared by the
+    signature checks; a private one is used when omitted. Pass the one the caller's
+    follow-up state reads use so each endpoint key is enumerated once per listing.
     """
     db = _load_vendor_db_split(ini_path)
     guid = _extract_endpoint_guid_from_device_id(device_id)
     if not guid:
         return []
     guid_lc = guid.strip().lower()
+    if values_cache is None:
+        values_cache = {}
     out = []
-    seen_sections = set()
-    for entry in db.get("fx") or []:
-        # Check for explicit GUID membership first. If found, add it and move on.
-        devs = {d.lower() for d in (entry.get("devices") or [])}
-        if devs and guid_lc in devs:
-            e = dict(entry)
-            e["source"] = "ini"
-            out.append({"fx_name": entry.get("fx_name"), "entry": e})
-            seen_sections.add(entry["name"])
-            continue
-
-    for entry in db.get("fx") or []:
-        if entry["name"] in seen_sections:
-            continue
+    for entry, matched_by in _fx_entries_matching(db.get("fx") or (), device_id, flow, guid_lc,
+                                                  values_cache=values_cache):
+        out.append({"fx_name": entry.get("fx_name"), "entry": _fx_result_entry(entry, matched_by)})
+    return out
+def _fx_entries_matching(entries, device_id, flow, guid_lc, values_cache=None):
+    """
+    Yield (entry, matched_by) for the FX entries (INI order) that apply to this endpoint:
+    explicit GUID members first (matched_by None), then entries whose registry
+    signature matches now (matched_by "signature").
+    values_cache: optional per-batch dict for the signature reads (see _read_endpoint_value).
+    """
+    others = []
+    for entry in entries:
+        devs = entry.get("devices_set")
+        if devs is None:
+            devs = set(entry.get("devices") or ())
+        if guid_lc in devs:
+            yield entry, None
+        else:
+            others.append(entry)
+    for entry in others:
         try:
             # Universal discovery: if not an explicit member, check if the signature matches.
             # A device_name_pattern is for readability/learn only, not a hard filter for discovery.
             if entry.get("multi_write"):
-                ok_sig = _fx_signature_matches_multi(entry, device_id, flow)
+                ok_sig = _fx_signature_matches_multi(entry, device_id, flow, values_cache)
             else:
-                ok_sig = _legacy_value_matches_this_guid_now(entry, device_id, flow)
-            if ok_sig:
-                e = dict(entry)
-                e["source"] = "ini"
-                e["_matchedBy"] = "signature"
-                out.append({"fx_name": entry.get("fx_name"), "entry": e})
+                ok_sig = _legacy_value_matches_this_guid_now(entry, device_id, flow, values_cache)
         except Exception:
             continue
-    return out
+        if ok_sig:
+            yield entry, "signature"
+def _fx_result_entry(entry, matched_by):
+    """
+    Matched FX entry as returned by the FX lookups, tagged source='ini'.
+    Explicit members get the loaded read-only entry itself (tagged at load, and
+    every caller only reads it); only signature matches pay for a copy to carry
+    _matchedBy.
+    """
+    if not matched_by and entry.get("source") == "ini":
+        return entry
+    e = dict(entry)
+    e["source"] = "ini"
+    if matched_by:
+        e["_matchedBy"] = matched_by
+    return e
+def _fx_named_matches(device_id, flow, fx_name, ini_path=None):
+    """
+    Lazily yield (entry, matched_by) for the FX entries named fx_name that apply to
+    this endpoint, in _fx_entries_matching order. Yields nothing for an empty name,
+    an unknown endpoint or a name with no learned entries.
+    """
+    fx_lc = str(fx_name or "").strip().lower()
+    if not fx_lc:
+        return iter(())
+    guid = _extract_endpoint_guid_from_device_id(device_id)
+    if not guid:
+        return iter(())
+    db = _load_vendor_db_split(ini_path)
+    # Only entries named fx_name can match, so signature-check just those (each check
+    # reads the registry) instead of every FX entry the full listing would probe.
+    named = (db.get("fx_by_name") or {}).get(fx_lc, ())
+    if not named:
+        return iter(())
+    return _fx_entries_matching(named, device_id, flow, guid.strip().lower())
 def _find_fx_for_device(device_id, flow, fx_name, ini_path=None, device_name=None):
     """
     Find FX entries matching device and effect name.
     Uses same match rules as _list_fx_for_device (GUID or spoof if device_name provided).
     """
-    fx_lc = str(fx_name or "").strip().lower()
-    if not fx_lc:
-        return []
-    lst = _list_fx_for_device(device_id, flow, ini_path=ini_path, device_name=device_name)
-    matches = []
-    for item in lst:
-        if (item.get("fx_name") or "").strip().lower() == fx_lc:
-            e = dict(item.get("entry") or {})
-            e["source"] = "ini"
-            matches.append(e)
-    return matches
+    return [_fx_result_entry(entry, matched_by)
+            for entry, matched_by in _fx_named_matches(device_id, flow, fx_name, ini_path)]
 def _apply_enhancements(device_id, flow, enable, prefer_hklm=False, allow_universal_scan=False, vendor_ini_path=None):
     """
     Vendor-only policy:
@@ -2629,10 +3295,12 @@ def _apply_fx(device_id, flow, fx_name, enable, ini_path=None, device_name=None)
       - multi_write: read back state using decider/quorum logic after writing
       - legacy: poll the single learned DWORD until stable
     """
-    entries = _find_fx_for_device(device_id, flow, fx_name, ini_path, device_name=device_name)
-    if not entries:
+    # Only the first match is applied: stop at it rather than signature-checking (and
+    # copying) every later entry of the same name the way _find_fx_for_device does.
+    first = next(_fx_named_matches(device_id, flow, fx_name, ini_path), None)
+    if first is None:
         return False, None, None
-    entry = entries[0]
+    entry = first[0]
     if entry.get("multi_write"):
         wrote_all = _perform_multi_writes(entry, device_id, flow, enable)
         if not wrote_all: